@@ -0,0 +1,61 @@
+import os
+import numpy as np
+from eventlog import read_binary_log
+
+"""
+    Shared loading and windowing helpers for the plotting and comparison
+    scripts. Logs are read into NumPy arrays (no pandas), sorted by
+    TimeGlob once, and windows are found with searchsorted.
+"""
+
+# The numeric columns every analysis needs
+NUMERIC_COLUMNS = ["TimeGlob", "TimeLocal", "QueueLen"]
+
+def find_logs(base_dir):
+    """Returns the per-agent log directories under base_dir that hold an event log, sorted by name."""
+    log_dirs = []
+    for dir_now in sorted(os.listdir(base_dir)):
+        log_dir = os.path.join(base_dir, dir_now)
+        if os.path.isdir(log_dir) and event_log_path(log_dir) is not None:
+            log_dirs.append(log_dir)
+    return log_dirs
+
+def event_log_path(log_dir):
+    for name in ("events.bin", "events.csv"):
+        path = os.path.join(log_dir, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+def load_log(log_dir):
+    """
+        Loads one agent's log as a dict of float arrays: TimeGlob, TimeLocal,
+        QueueLen and JumpTime (the expanding mean of TimeLocal diffs),
+        sorted by TimeGlob.
+    """
+    path = event_log_path(log_dir)
+    if path.endswith(".bin"):
+        raw = read_binary_log(path)
+        columns = {c: np.asarray(raw[c], dtype=float) for c in NUMERIC_COLUMNS}
+    else:
+        # Event, FromPort and ToPort are text; only parse the numeric columns
+        data = np.loadtxt(path, delimiter=",", skiprows=1, usecols=(1, 2, 3), ndmin=2)
+        columns = {c: data[:, i] for i, c in enumerate(NUMERIC_COLUMNS)}
+
+    # JumpTime is computed in log order, as make_animations always has
+    diffs = np.diff(columns["TimeLocal"], prepend=columns["TimeLocal"][:1])
+    columns["JumpTime"] = np.cumsum(diffs) / np.arange(1, len(diffs) + 1)
+
+    order = np.argsort(columns["TimeGlob"], kind="stable")
+    return {c: v[order] for c, v in columns.items()}
+
+def window_bounds(times, frames, window):
+    """
+        For sorted times, returns (lo, hi) index arrays such that
+        times[lo[f]:hi[f]] is frame f's window: [0, f] while f < window,
+        otherwise (f - window, f].
+    """
+    frames = np.asarray(frames, dtype=float)
+    hi = np.searchsorted(times, frames, side="right")
+    lo = np.where(frames < window, 0, np.searchsorted(times, frames - window, side="right"))
+    return lo, hi
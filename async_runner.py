@@ -0,0 +1,200 @@
+import asyncio
+import time
+from client import encode_messages, decode_frames
+from runner import run_event, make_client
+from metrics import MetricsServer
+from topology import neighbors, broadcast_fanout
+
+"""
+    Outbound side of the asyncio engine: one persistent stream per peer,
+    opened lazily. Frames sent while a connection is being opened are
+    buffered and written once it is up. With coalesce, messages are held
+    per peer until the end of the current loop iteration, so everything
+    sent to a peer by agents ticking at the same instant goes out in one
+    write.
+"""
+class AsyncPeerPool:
+    def __init__(self, host, wire="json", coalesce=False):
+        self.host = host
+        self.wire = wire
+        self.coalesce = coalesce
+        self.writers = {}
+        self.pending = {}
+        self.outbox = {}
+        self.tasks = set()
+        self.connects = 0
+        self.reuses = 0
+        self.coalesced = 0
+
+    # Matches the ClientProcess.sender signature
+    def send(self, port, message):
+        if not self.coalesce:
+            self.write(port, encode_messages([message], self.wire))
+            return
+        if not self.outbox:
+            asyncio.get_running_loop().call_soon(self.flush)
+        self.outbox.setdefault(port, []).append(message)
+
+    def flush(self):
+        outbox, self.outbox = self.outbox, {}
+        for port, messages in outbox.items():
+            self.write(port, encode_messages(messages, self.wire))
+            self.coalesced += len(messages) - 1
+
+    def write(self, port, frame):
+        writer = self.writers.get(port)
+        if writer is not None and not writer.is_closing():
+            writer.write(frame)
+            self.reuses += 1
+            return
+
+        # Connection missing or dropped: (re)connect lazily
+        if port in self.pending:
+            self.pending[port].append(frame)
+            return
+        self.pending[port] = [frame]
+        task = asyncio.get_running_loop().create_task(self.connect(port))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def connect(self, port):
+        try:
+            reader, writer = await asyncio.open_connection(self.host, port)
+        except OSError as e:
+            print(f"[ERROR] Could not send message to port {port}: {e}")
+            del self.pending[port]
+            return
+        self.connects += 1
+        self.writers[port] = writer
+        writer.write(b''.join(self.pending.pop(port)))
+
+    async def close(self):
+        self.flush()
+        for task in list(self.tasks):
+            task.cancel()
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+
+"""
+    Inbound side of the asyncio engine: accepts framed connections on a
+    listening socket, reassembles frames and hands each batch to on_batch.
+"""
+class FrameServer:
+    def __init__(self, sock, on_batch):
+        self.sock = sock
+        self.on_batch = on_batch
+        self.server = None
+        # Inbound connection handler task -> its stream writer
+        self.handlers = {}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_peer, sock=self.sock)
+
+    async def handle_peer(self, reader, writer):
+        self.handlers[asyncio.current_task()] = writer
+        buf = bytearray()
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                buf += data
+                batch = []
+                decode_frames(buf, batch)
+                self.on_batch(batch)
+        except ConnectionError:
+            pass
+        finally:
+            self.handlers.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def close(self):
+        self.server.close()
+        # Closing the transports ends each handler's read loop
+        for writer in list(self.handlers.values()):
+            writer.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+
+"""
+    Schedules a communicator's ticks on the loop at start + k/clock_speed and
+    returns a future that resolves once time_limit seconds have passed. start
+    is the wall-clock start time shared with the other agents, or now.
+"""
+def start_ticking(loop, communicator, config, time_limit, start_time=None):
+    other_ports = neighbors(config)
+    fanout = broadcast_fanout(config)
+    clock_speed = config['clock_speed']
+    name = config['name']
+    randn_UB = config['randn_UB']
+    quiet = config.get('quiet', False)
+
+    done = loop.create_future()
+    now = time.time()
+    if start_time is None:
+        start_time = now
+    # The same instant on the loop's clock
+    start_loop = loop.time() + (start_time - now)
+    communicator.start(start_time)
+
+    def on_tick(k):
+        communicator.time = time.time()
+        # If time_limit seconds have passed, stop ticking
+        if communicator.time - start_time > time_limit:
+            done.set_result(None)
+            return
+
+        if k > 0:
+            communicator.advance()
+        communicator.drain_shared()
+        run_event(communicator, other_ports, randn_UB, fanout=fanout)
+
+        # After executing, return to unavailable
+        communicator.set_unavailable()
+        if not quiet:
+            print(f"Process {name} : Tick {communicator.ticks}")
+
+        loop.call_at(start_loop + (k + 1) / clock_speed, on_tick, k + 1)
+
+    loop.call_at(start_loop, on_tick, 0)
+    return done
+
+"""
+    Runs one agent on an asyncio event loop. Ticks are scheduled with
+    loop.call_at at start + k/clock_speed, so an idle agent sleeps between
+    ticks instead of spinning. Uses the same framed protocol as pooled
+    ClientProcess instances.
+"""
+async def run_agent(config, time_limit, start=None, server_socket=None):
+    communicator = make_client(config, pooled=True, server_socket=server_socket)
+    pool = AsyncPeerPool(communicator.host, communicator.wire, communicator.coalesce)
+    communicator.sender = pool.send
+
+    server = FrameServer(communicator.server_socket, communicator.append_messages)
+    await server.start()
+
+    # The endpoint thread only reads counters the loop updates in place
+    metrics_server = None
+    if config.get('metrics_port'):
+        metrics_server = MetricsServer(config['metrics_port'], lambda: [communicator.metrics_snapshot()])
+
+    # Wait for a bit before starting the main loop, or for the launcher's start
+    loop = asyncio.get_running_loop()
+    if start is None:
+        await asyncio.sleep(1)
+        start_time = None
+    else:
+        start_time = await loop.run_in_executor(None, start)
+
+    done = start_ticking(loop, communicator, config, time_limit, start_time)
+    await done
+
+    await server.close()
+    await pool.close()
+    if metrics_server is not None:
+        metrics_server.close()
+    communicator.close()
+    print(f"[INFO] Connections opened: {pool.connects}, reused: {pool.reuses}, coalesced: {pool.coalesced}")
+
+def run_async(config, time_limit, start=None, server_socket=None):
+    asyncio.run(run_agent(config, time_limit, start, server_socket))
@@ -0,0 +1,189 @@
+import time
+import argparse
+import numpy as np
+
+"""
+    Vectorized batch simulator for parameter sweeps. Simulates many
+    independent replicas of one experiment at once: clocks, queues and
+    random draws are (replicas x agents) NumPy arrays stepped together.
+
+    Agents tick at k/clock_speed and apply the runner's event rule: read one
+    queued message if there is one, otherwise draw randint(1, randn_UB + 1)
+    for an internal event, a unicast or a broadcast. Messages are delivered
+    immediately. Agents acting at the same instant act in index order, which
+    is the only ordering the live system doesn't pin down either.
+"""
+
+# Stats reported per configuration by summarize()
+SUMMARY_COLUMNS = ["clock_speeds", "randn_UB", "replicas", "drift_mean", "drift_max", "drift_final",
+                   "jump_mean", "jump_slowest", "queue_max", "queue_mean", "queue_growth"]
+
+def tick_schedule(clock_speeds, duration):
+    """Returns the distinct tick times and, for each, the agents ticking then and their tick index."""
+    times = []
+    agents = []
+    ks = []
+    for i, speed in enumerate(clock_speeds):
+        k = np.arange(int(np.floor(duration * speed)) + 1)
+        times.append(k / speed)
+        agents.append(np.full(len(k), i))
+        ks.append(k)
+    times = np.concatenate(times)
+    agents = np.concatenate(agents)
+    ks = np.concatenate(ks)
+
+    # Group ticks falling on the same instant (within float error)
+    order = np.lexsort((agents, times))
+    times, agents, ks = times[order], agents[order], ks[order]
+    breaks = np.flatnonzero(np.diff(times) > 1e-9) + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks, [len(times)]])
+    return [(times[a], agents[a:b], ks[a:b]) for a, b in zip(starts, ends)]
+
+class BatchState:
+    def __init__(self, n_agents, replicas, capacity=64):
+        self.clocks = np.zeros((replicas, n_agents), dtype=np.int64)
+        self.events = np.zeros((replicas, n_agents), dtype=np.int64)
+        # Per-agent FIFO of message ticks as a ring buffer
+        self.queue = np.zeros((replicas, n_agents, capacity), dtype=np.int64)
+        self.head = np.zeros((replicas, n_agents), dtype=np.int64)
+        self.qlen = np.zeros((replicas, n_agents), dtype=np.int64)
+        self.rows = np.arange(replicas)
+
+    def grow(self):
+        capacity = self.queue.shape[2]
+        # Unroll each ring so it starts at slot 0, then double the capacity
+        idx = (self.head[..., None] + np.arange(capacity)) % capacity
+        unrolled = np.take_along_axis(self.queue, idx, axis=2)
+        self.queue = np.zeros(self.queue.shape[:2] + (2 * capacity,), dtype=np.int64)
+        self.queue[..., :capacity] = unrolled
+        self.head[:] = 0
+
+    def push(self, rows, targets, ticks):
+        if len(rows) == 0:
+            return
+        if self.qlen[rows, targets].max() >= self.queue.shape[2]:
+            self.grow()
+        capacity = self.queue.shape[2]
+        slots = (self.head[rows, targets] + self.qlen[rows, targets]) % capacity
+        self.queue[rows, targets, slots] = ticks
+        self.qlen[rows, targets] += 1
+
+    def pop(self, rows, agent):
+        capacity = self.queue.shape[2]
+        ticks = self.queue[rows, agent, self.head[rows, agent]]
+        self.head[rows, agent] = (self.head[rows, agent] + 1) % capacity
+        self.qlen[rows, agent] -= 1
+        return ticks
+
+def simulate_batch(clock_speeds, randn_UB, duration, replicas, seed=0):
+    """
+        Simulates `replicas` independent runs. Statistics are accumulated
+        after every step rather than traced, so memory stays at
+        O(replicas x agents x queue capacity) however long the run.
+    """
+    n = len(clock_speeds)
+    rng = np.random.default_rng(seed)
+    state = BatchState(n, replicas)
+    others = [np.array([j for j in range(n) if j != i]) for i in range(n)]
+
+    stats = {
+        "steps": 0,
+        "spread_sum": np.zeros(replicas),
+        "spread_max": np.zeros(replicas),
+        "queue_sum": np.zeros((replicas, n)),
+        "queue_max": np.zeros((replicas, n), dtype=np.int64),
+    }
+    for t, acting, ks in tick_schedule(clock_speeds, duration):
+        for i, k in zip(acting, ks):
+            if k > 0:
+                state.clocks[:, i] += 1
+            state.events[:, i] += 1
+
+            # Replicas with a queued message read it
+            has_msg = state.qlen[:, i] > 0
+            rows = state.rows[has_msg]
+            if len(rows):
+                msg_ticks = state.pop(rows, i)
+                state.clocks[rows, i] = np.maximum(state.clocks[rows, i], msg_ticks)
+
+            # The rest roll for an event
+            rows = state.rows[~has_msg]
+            randn = rng.integers(1, randn_UB + 2, size=len(rows))
+            unicast = randn <= n - 1
+            broadcast = randn == n
+
+            uni_rows = rows[unicast]
+            state.push(uni_rows, others[i][randn[unicast] - 1], state.clocks[uni_rows, i])
+
+            b_rows = rows[broadcast]
+            if len(b_rows):
+                b_targets = np.broadcast_to(others[i], (len(b_rows), n - 1))
+                b_rows_2d = np.broadcast_to(b_rows[:, None], b_targets.shape)
+                b_ticks = np.broadcast_to(state.clocks[b_rows, i][:, None], b_targets.shape)
+                state.push(b_rows_2d.ravel(), b_targets.ravel(), b_ticks.ravel())
+
+        # Drift: spread between the fastest and slowest logical clock
+        spread = state.clocks.max(axis=1) - state.clocks.min(axis=1)
+        stats["steps"] += 1
+        stats["spread_sum"] += spread
+        np.maximum(stats["spread_max"], spread, out=stats["spread_max"])
+        stats["queue_sum"] += state.qlen
+        np.maximum(stats["queue_max"], state.qlen, out=stats["queue_max"])
+
+    stats["duration"] = t
+    stats["spread_final"] = spread
+    return state, stats
+
+def summarize(clock_speeds, randn_UB, duration, replicas, seed=0):
+    """Runs one configuration and reduces it to drift, jump size and queue statistics."""
+    state, stats = simulate_batch(clock_speeds, randn_UB, duration, replicas, seed)
+
+    # Jump size: the final value of the expanding mean of TimeLocal diffs, per agent
+    jumps = state.clocks / np.maximum(state.events - 1, 1)
+    slowest = int(np.argmin(clock_speeds))
+
+    return {
+        "clock_speeds": ":".join(f"{s:g}" for s in clock_speeds),
+        "randn_UB": randn_UB,
+        "replicas": replicas,
+        "drift_mean": float(stats["spread_sum"].mean() / stats["steps"]),
+        "drift_max": float(stats["spread_max"].mean()),
+        "drift_final": float(stats["spread_final"].mean()),
+        "jump_mean": float(jumps.mean()),
+        "jump_slowest": float(jumps[:, slowest].mean()),
+        "queue_max": float(stats["queue_max"].max(axis=1).mean()),
+        "queue_mean": float(stats["queue_sum"].mean() / stats["steps"]),
+        "queue_growth": float(state.qlen.max(axis=1).mean() / max(stats["duration"], 1e-9)),
+    }
+
+def sweep(grid, duration, replicas, seed=0):
+    """Summarizes every (clock_speeds, randn_UB) pair in grid."""
+    return [summarize(speeds, ub, duration, replicas, seed + i) for i, (speeds, ub) in enumerate(grid)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized parameter sweep over clock speeds and randn_UB.")
+    # -c or --clock-speeds : repeatable, comma-separated clock speeds of one experiment
+    parser.add_argument("-c", "--clock-speeds", type=str, action="append", required=True,
+                        help="Comma-separated clock speeds, e.g. 1,3,6. Repeat for more experiments.")
+    # -u or --randn-ub : comma-separated randn_UB values to sweep
+    parser.add_argument("-u", "--randn-ub", type=str, default="10", help="Comma-separated randn_UB values.")
+    parser.add_argument("-t", "--time", type=float, default=120, help="Simulated seconds per run.")
+    parser.add_argument("-r", "--replicas", type=int, default=100, help="Replicas per configuration.")
+    parser.add_argument("--seed", type=int, default=0, help="Base random seed.")
+    parser.add_argument("-o", "--output", type=str, default="sweep.csv", help="CSV file for the summary table.")
+    args = parser.parse_args()
+
+    grid = [([float(s) for s in speeds.split(",")], int(ub))
+            for speeds in args.clock_speeds for ub in args.randn_ub.split(",")]
+
+    start = time.time()
+    rows = sweep(grid, args.time, args.replicas, args.seed)
+    with open(args.output, 'w') as f:
+        f.write(",".join(SUMMARY_COLUMNS) + "\n")
+        for row in rows:
+            f.write(",".join(str(row[c]) for c in SUMMARY_COLUMNS) + "\n")
+    print(f"[INFO] Swept {len(grid)} configurations x {args.replicas} replicas in {time.time() - start:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import threading
+import multiprocessing
+from contextlib import redirect_stdout
+import numpy as np
+from client import ClientProcess
+from runner import sleep_until
+from clocks import bench_clocks
+from host import raise_fd_limit
+
+"""
+    Benchmarks for the messaging, logging and clock hot paths, all on
+    loopback. Every measurement becomes a named metric with its unit and
+    whether higher is better; results are written as JSON and compared
+    against a baseline file so regressions show up as [ERROR] lines and a
+    non-zero exit status.
+
+    Sections:
+        send: send_message throughput and per-call latency, unicast and
+            broadcast, for each peer count and transport
+        receive: await_message / await_messages throughput
+        logging: per-event cost of each log format and writer
+        tick: highest clock_speed a single agent sustains per scheduler
+        clocks: per-message cost of the optional clocks at 60 agents
+"""
+
+SECTIONS = ["send", "receive", "logging", "tick", "clocks"]
+
+# Transports measured by the send and receive sections
+MODES = {
+    "oneshot": {"pooled": False},
+    "pooled": {"pooled": True},
+    "pooled_binary": {"pooled": True, "wire": "binary"},
+}
+
+# Agents created by the benchmarks log here; removed when the suite finishes
+BENCH_DIR = "_bench"
+
+def metric(value, unit, higher_is_better=True):
+    return {"value": float(value), "unit": unit, "higher_is_better": higher_is_better}
+
+# Child process: listens on ports and discards everything until stop is set
+def serve_receivers(ports, options, ready, stop):
+    raise_fd_limit()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        receivers = [ClientProcess(1, port, f"recv_{port}", BENCH_DIR, **options) for port in ports]
+
+    def drain(receiver):
+        while not receiver.closed:
+            if receiver.pooled:
+                receiver.await_messages()
+            else:
+                receiver.await_message()
+
+    threads = [threading.Thread(target=drain, args=(receiver,), daemon=True) for receiver in receivers]
+    for t in threads:
+        t.start()
+    ready.set()
+    stop.wait()
+    for receiver in receivers:
+        receiver.close()
+
+def bench_send(peers, mode, broadcast, duration, base_port):
+    """Times send_message calls against peers receivers in a separate process."""
+    ctx = multiprocessing.get_context("fork")
+    ready, stop = ctx.Event(), ctx.Event()
+    ports = list(range(base_port, base_port + peers))
+    child = ctx.Process(target=serve_receivers, args=(ports, MODES[mode], ready, stop))
+    child.start()
+    while not ready.wait(0.1):
+        if not child.is_alive():
+            raise RuntimeError(f"Receivers on ports {ports[0]}-{ports[-1]} failed to start")
+
+    sender = ClientProcess(1, base_port + peers, "sender", BENCH_DIR, listen=False, **MODES[mode])
+    message = {"tick": 1, "port": sender.port}
+    latencies = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        target = ports if broadcast else ports[len(latencies) % peers]
+        start = time.perf_counter()
+        sender.send_message(message, target)
+        latencies.append(time.perf_counter() - start)
+    sender.close()
+    stop.set()
+    child.join()
+
+    latencies = np.array(latencies)
+    messages = len(latencies) * (peers if broadcast else 1)
+    name = f"send.{mode}.{'broadcast' if broadcast else 'unicast'}.{peers}"
+    return {
+        f"{name}.msgs_per_s": metric(messages / latencies.sum(), "msg/s"),
+        f"{name}.p50_us": metric(np.percentile(latencies, 50) * 1e6, "us", False),
+        f"{name}.p99_us": metric(np.percentile(latencies, 99) * 1e6, "us", False),
+    }
+
+# Child process: sends to port as fast as the transport allows for duration seconds
+def blast(port, options, duration):
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        sender = ClientProcess(1, port + 1, "blaster", BENCH_DIR, listen=False, **options)
+        end = time.perf_counter() + duration
+        i = 0
+        while time.perf_counter() < end:
+            sender.send_message({"tick": i, "port": sender.port}, port)
+            i += 1
+        sender.close()
+
+def bench_receive(mode, duration, base_port):
+    """
+        Messages per second through await_message(s), from the first message
+        to the last. One-shot receivers fall far behind: connections complete
+        before they are accepted, so the 5-deep backlog overflows and
+        connects wait out a 1s SYN retransmit.
+    """
+    receiver = ClientProcess(1, base_port, "receiver", BENCH_DIR, **MODES[mode])
+    ctx = multiprocessing.get_context("fork")
+    child = ctx.Process(target=blast, args=(base_port, MODES[mode], duration))
+    child.start()
+
+    # Once the sender is done and the last messages had time to arrive, closing
+    # the receiver makes await_message(s) return None
+    def stop():
+        child.join()
+        time.sleep(0.5)
+        receiver.close()
+    stopper = threading.Thread(target=stop)
+    stopper.start()
+
+    received = 0
+    first = last = None
+    while True:
+        if receiver.pooled:
+            batch = receiver.await_messages()
+            n = None if batch is None else len(batch)
+        else:
+            n = None if receiver.await_message() is None else 1
+        if n is None:
+            if receiver.closed:
+                break
+            continue
+        now = time.perf_counter()
+        if first is None:
+            first = now
+            n -= 1
+        received += n
+        last = now
+    stopper.join()
+    rate = received / (last - first) if received else 0.0
+    return {f"receive.{mode}.msgs_per_s": metric(rate, "msg/s")}
+
+def bench_logging(log_format, log_writer, events):
+    """Cost of internal_event() per event, including the final flush on close."""
+    agent = ClientProcess(1, 0, f"log_{log_format}_{log_writer}", BENCH_DIR, listen=False,
+                          log_format=log_format, log_writer=log_writer)
+    agent.time = time.time()
+    start = time.perf_counter()
+    for _ in range(events):
+        agent.internal_event()
+    agent.close()
+    elapsed = time.perf_counter() - start
+    return {f"logging.{log_format}.{log_writer}.us_per_event": metric(elapsed / events * 1e6, "us", False)}
+
+def sustains(clock_speed, scheduler, duration):
+    """Runs runner.py's tick loop alone for duration seconds; True if no more than 1% of ticks were missed."""
+    agent = ClientProcess(clock_speed, 0, f"tick_{scheduler}", BENCH_DIR, listen=False, scheduler=scheduler)
+    absolute = scheduler == "absolute"
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        start_time = time.time()
+        agent.start(start_time)
+        while True:
+            if absolute and not agent.is_available:
+                sleep_until(agent.next_deadline)
+            agent.time = time.time()
+            if agent.time - start_time > duration:
+                break
+            agent.update_availability()
+            if agent.is_available:
+                agent.internal_event()
+                agent.set_unavailable()
+                print(f"Process {agent.port} : Tick {agent.ticks}")
+    ran = agent.ticks_run
+    agent.close()
+    return ran >= 0.99 * duration * clock_speed
+
+def bench_tick(scheduler, duration, start_speed=100, max_speed=409600):
+    """Doubles clock_speed until ticks are missed; reports the last speed that kept up."""
+    best = 0
+    speed = start_speed
+    while speed <= max_speed and sustains(speed, scheduler, duration):
+        best = speed
+        speed *= 2
+    return {f"tick.{scheduler}.max_clock_speed": metric(best, "ticks/s")}
+
+def run_suite(sections, peer_counts, duration, base_port, quick=False):
+    metrics = {}
+    def report(results):
+        for name, m in results.items():
+            print(f"[INFO] {name}: {m['value']:.2f} {m['unit']}")
+        metrics.update(results)
+
+    if "send" in sections:
+        for peers in peer_counts:
+            for mode in MODES:
+                for broadcast in (False, True):
+                    report(bench_send(peers, mode, broadcast, duration, base_port))
+    if "receive" in sections:
+        for mode in MODES:
+            report(bench_receive(mode, duration, base_port))
+    if "logging" in sections:
+        for log_format in ("csv", "binary"):
+            for log_writer in ("inline", "thread"):
+                report(bench_logging(log_format, log_writer, 20000 if quick else 200000))
+    if "tick" in sections:
+        for scheduler in ("relative", "absolute"):
+            report(bench_tick(scheduler, duration))
+    if "clocks" in sections:
+        for kind, stats in bench_clocks(60, 2000 if quick else 20000).items():
+            report({f"clocks.{kind}.60.us_per_message": metric(stats["us_per_message"], "us", False)})
+    return metrics
+
+def compare_results(metrics, baseline, tolerance):
+    """
+        Returns (name, baseline value, value, relative change, regressed) for
+        every metric in both runs. A metric regressed if it got worse by more
+        than tolerance (a fraction of the baseline value).
+    """
+    rows = []
+    for name, m in metrics.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]["value"]
+        change = (m["value"] - base) / base if base else 0.0
+        worse = -change if m["higher_is_better"] else change
+        rows.append((name, base, m["value"], change, worse > tolerance))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark messaging, logging and clock hot paths.")
+    # -o or --output : JSON file for this run's results
+    parser.add_argument("-o", "--output", type=str, default="bench_results.json", help="Results file.")
+    # -b or --baseline : results of an earlier run to compare against
+    parser.add_argument("-b", "--baseline", type=str, default="bench_baseline.json", help="Baseline file.")
+    # --save-baseline : also write this run's results to the baseline file
+    parser.add_argument("--save-baseline", action="store_true", help="Make this run the new baseline.")
+    # --tolerance : fraction a metric may worsen before it counts as a regression
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown, e.g. 0.2 for 20%%.")
+    # -s or --sections : comma-separated subset of the sections to run
+    parser.add_argument("-s", "--sections", type=str, default=",".join(SECTIONS), help="Sections to run.")
+    # -p or --peers : comma-separated peer counts for the send section
+    parser.add_argument("-p", "--peers", type=str, default="3,30,60,200", help="Peer counts.")
+    # -d or --duration : seconds per send measurement and per tick-rate trial
+    parser.add_argument("-d", "--duration", type=float, default=1.0, help="Seconds per measurement.")
+    parser.add_argument("--quick", action="store_true", help="Fewer events per measurement.")
+    # --port : first port to listen on. Keep it below the ephemeral range (32768+ on
+    # Linux), or the one-shot benchmarks' client sockets can take the ports first
+    parser.add_argument("--port", type=int, default=21000, help="First loopback port to use.")
+    args = parser.parse_args()
+
+    sections = args.sections.split(",")
+    unknown = [s for s in sections if s not in SECTIONS]
+    if unknown:
+        print(f"[ERROR] Unknown sections: {', '.join(unknown)}")
+        exit(1)
+
+    raise_fd_limit()
+    metrics = run_suite(sections, [int(p) for p in args.peers.split(",")], args.duration, args.port, args.quick)
+    shutil.rmtree(f"logs/{BENCH_DIR}", ignore_errors=True)
+
+    results = {
+        "meta": {"time": time.time(), "python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "sections": sections},
+        "metrics": metrics,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"[INFO] Wrote {args.output}")
+
+    regressions = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["metrics"]
+        for name, base, value, change, regressed in compare_results(metrics, baseline, args.tolerance):
+            if regressed:
+                regressions += 1
+                print(f"[ERROR] Regression: {name}: {value:.2f} vs {base:.2f} ({change:+.0%})")
+            else:
+                print(f"[INFO] {name}: {value:.2f} vs {base:.2f} ({change:+.0%})")
+    if args.save_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"[INFO] Saved {args.baseline}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
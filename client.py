@@ -3,30 +3,139 @@ import os
 import socket
 import json
 import time
+import selectors
+import struct
+from itertools import groupby
 from collections import deque
-from enum import Enum
+from eventlog import Events, CsvEventLog, BinaryEventLog, ThreadedEventLog
+from clocks import make_clock, VectorClock
+from queues import make_queue
+from metrics import AgentMetrics
+from shm_transport import SharedMemoryTransport, SHM_SLOTS
 
-# Create an enum
-class Events(Enum):
-    RECEIVED_MSG = 1
-    SENT_MSG = 2
-    INTERNAL_EVENT = 3
-    BROADCAST_MSG = 4
+# Pooled connections carry length-prefixed frames (4-byte big-endian size)
+FRAME_HEADER = struct.Struct("!I")
+
+"""
+    Binary frames: a JSON payload always starts with '{', so a payload
+    starting with WIRE_MAGIC | flags is instead a run of fixed-size records,
+    tick and sender port plus the optional fields the flags select. Messages
+    with any other fields (or non-integer ticks and ports) travel as JSON.
+"""
+WIRE_MAGIC = 0xB0
+WIRE_RECORDS = {
+    0: (struct.Struct("<qi"), ("tick", "port")),
+    1: (struct.Struct("<qid"), ("tick", "port", "sent")),
+    2: (struct.Struct("<qii"), ("tick", "port", "to")),
+    3: (struct.Struct("<qidi"), ("tick", "port", "sent", "to")),
+}
+WIRE_FLAGS = {frozenset(fields): flags for flags, (_, fields) in WIRE_RECORDS.items()}
+
+def encode_frame(message):
+    payload = json.dumps(message).encode('utf-8')
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+def wire_flags(message):
+    """The binary record kind for message, or None if it has to be sent as JSON."""
+    flags = WIRE_FLAGS.get(frozenset(message))
+    if flags is None or type(message["tick"]) is not int or type(message["port"]) is not int:
+        return None
+    if flags & 2 and type(message["to"]) is not int:
+        return None
+    return flags
+
+def encode_messages(messages, wire="json"):
+    """
+        Frames a list of messages for one peer as a single bytes object. With
+        wire="binary", each run of messages with the same fields shares one
+        binary frame.
+    """
+    if wire != "binary":
+        return b''.join([encode_frame(message) for message in messages])
+    parts = []
+    for flags, run in groupby(messages, key=wire_flags):
+        if flags is None:
+            parts.extend(encode_frame(message) for message in run)
+            continue
+        record, fields = WIRE_RECORDS[flags]
+        run = list(run)
+        payload = bytearray(1 + record.size * len(run))
+        payload[0] = WIRE_MAGIC | flags
+        for i, message in enumerate(run):
+            record.pack_into(payload, 1 + i * record.size, *[message[f] for f in fields])
+        parts.append(FRAME_HEADER.pack(len(payload)))
+        parts.append(payload)
+    return b''.join(parts)
+
+def decode_frames(buf, out):
+    """Appends every message in buf's complete frames to out and drops them from buf."""
+    offset = 0
+    while len(buf) - offset >= FRAME_HEADER.size:
+        size = FRAME_HEADER.unpack_from(buf, offset)[0]
+        start = offset + FRAME_HEADER.size
+        end = start + size
+        if len(buf) < end:
+            break
+        kind = buf[start]
+        if kind & 0xF0 == WIRE_MAGIC:
+            record, fields = WIRE_RECORDS[kind & 0x0F]
+            out.extend([dict(zip(fields, values)) for values in record.iter_unpack(buf[start + 1:end])])
+        else:
+            out.append(json.loads(buf[start:end]))
+        offset = end
+    del buf[:offset]
 
 """
     clock_speed: the speed of the client's clock, in tics/sec
     port: The port on which the client will listen for incoming messages.
+    pooled: keep one persistent, framed connection per peer instead of
+        connecting for every message. Peers must also be pooled.
+    listen: bind a server socket on port. Disable when messages are
+        delivered by the caller through append_message(s).
+    log_format: "csv" for events.csv, or "binary" for the compact
+        events.bin (see eventlog.py).
+    log_writer: "inline" writes events on the calling thread; "thread" hands
+        them to a background writer with a log_buffer-event buffer and
+        log_policy ("block", "drop" or "grow") for when it is full.
+    scheduler: "relative" runs a tick once a period has passed since the
+        last one, so lateness accumulates as drift from start + k/clock_speed;
+        "absolute" targets those deadlines.
+    wire: "json" or "binary" frames on pooled connections (see
+        encode_messages). Receivers decode either.
+    coalesce: hold pooled sends in a per-peer outbox until flush_outbox(),
+        called once per tick, so each peer gets at most one write per tick.
+    clock: "lamport" (ticks only), "vector" or "hlc" to also keep that
+        clock (see clocks.py), over this port and peers.
+    queue_policy: "fifo", "bounded" (at most queue_limit messages) or
+        "coalesce" (the highest tick per sender); see queues.py.
+    reads_per_tick: how many queued messages a tick may read.
+    metrics: keep live counters and histograms (see metrics.py), read
+        through metrics_snapshot().
 """
 class ClientProcess:
-    def __init__(self, clock_speed, port, name, experiment_dir):
+    def __init__(self, clock_speed, port, name, experiment_dir, pooled=False, listen=True, log_format="csv",
+                 log_writer="inline", log_buffer=65536, log_policy="block", scheduler="relative", wire="json", coalesce=False, clock="lamport", peers=(),
+                 queue_policy="fifo", queue_limit=1024, reads_per_tick=1, metrics=False, server_socket=None,
+                 transport="tcp", shm_slots=SHM_SLOTS, shm_peers=None):
         self.port = port
+        self.name = name
         self.host = '127.0.0.1'
 
-        # Create a socket for receiving messages.
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.bind((self.host, self.port))
-        self.server_socket.listen(5)
-        print(f"[INFO] Process listening on {self.host}:{self.port}")
+        # Create a socket for receiving messages. Agents hosted in-process
+        # (see host.py) receive through an in-memory channel instead.
+        self.server_socket = None
+        if server_socket is not None:
+            # Already bound and listening, e.g. by launcher.py, so no other
+            # process can take the port between choosing it and starting
+            self.server_socket = server_socket
+        elif listen:
+            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            # Pooled connections leave TIME_WAIT entries on this port when we close first
+            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.server_socket.bind((self.host, self.port))
+            # Every pooled peer connects at startup, so allow a deep backlog
+            self.server_socket.listen(128 if pooled else 5)
+            print(f"[INFO] Process listening on {self.host}:{self.port}")
 
         # Global clock
         self.clock_speed = clock_speed
@@ -37,18 +146,70 @@ class ClientProcess:
         self.is_available = True
         self.last_available=self.time
 
+        # Tick schedule ("relative": a period after the last event, "absolute":
+        # at start + k/clock_speed), per-tick lateness against the tick's own
+        # target and drift from the absolute deadline
+        self.scheduler = scheduler
+        self.start_time = None
+        self.next_deadline = self.time
+        self.ticks_run = 0
+        self.lateness_sum = 0.0
+        self.lateness_max = 0.0
+        self.drift = 0.0
+        self.drift_max = 0.0
+        self.overruns = 0
+
         self.logging = False
 
+        # Connection pool: port -> open socket, plus inbound connection -> read buffer
+        self.pooled = pooled
+        self.peer_sockets = {}
+        self.inbound = {}
+        self.selector = None
+        self.pending = deque()
+        self.closed = False
+
+        # Wire format and per-peer outbox (port -> messages) for coalesced sends
+        self.wire = wire
+        self.coalesce = coalesce
+        self.outbox = {}
+        self.coalesced = 0
+
+        # Optional callable(port, message) that replaces the socket transport,
+        # e.g. the asyncio engine's stream pool
+        self.sender = None
+        self.connects = 0
+        self.reuses = 0
+
+        # Optional vector or hybrid logical clock kept alongside ticks
+        self.clock = make_clock(clock, port, peers)
+
         # Queue of pending messages
-        self.network_queue = deque()
+        if queue_policy == "coalesce" and self.clock is not None:
+            raise ValueError(f"The coalesce queue policy would discard {clock} clock stamps")
+        # Vector stamps are per-peer deltas, so a dropped message loses its entries for good
+        if queue_policy == "bounded" and isinstance(self.clock, VectorClock):
+            raise ValueError("The bounded queue policy can drop messages, which would lose vector clock deltas")
+        # One-shot connections give no ordering between messages to the same peer
+        if not pooled and listen and isinstance(self.clock, VectorClock):
+            raise ValueError("Vector clocks need pooled connections for in-order delivery")
+        self.queue_policy = queue_policy
+        self.network_queue = make_queue(queue_policy, queue_limit)
+        self.reads_per_tick = reads_per_tick
 
-        # Create the logs directory if it doesn't exist
-        if not os.path.exists("logs"):
-            os.makedirs("logs")
-        if not os.path.exists(f"logs/{experiment_dir}"):
-            os.makedirs(f"logs/{experiment_dir}")
-        if not os.path.exists(f"logs/{experiment_dir}/{name}_log"):
-            os.makedirs(f"logs/{experiment_dir}/{name}_log")
+        # Live instrumentation, off unless requested
+        self.metrics = AgentMetrics() if metrics else None
+
+        # Shared-memory inbox for co-located peers, with TCP as the fallback.
+        # Hosted agents (no socket) already exchange messages in memory.
+        self.shm = None
+        if transport == "shm" and self.server_socket is not None:
+            self.shm = SharedMemoryTransport(port, peers if shm_peers is None else shm_peers, shm_slots)
+        elif transport not in ("tcp", "shm"):
+            raise ValueError(f"Unknown transport: {transport}")
+
+        # Create the logs directory if it doesn't exist; agents started together race to create it
+        os.makedirs(f"logs/{experiment_dir}/{name}_log", exist_ok=True)
 
         # Log metadata
         self.md_path = f"logs/{experiment_dir}/{name}_log/md.txt"
@@ -59,46 +220,214 @@ class ClientProcess:
             md.write(f"Experiment Directory: {experiment_dir}\n")
 
         # Event log
-        self.log_path = f"logs/{experiment_dir}/{name}_log/events.csv"
-        self.log = open(self.log_path, 'w')
-        self.log.write(f"Event,TimeGlob,TimeLocal,QueueLen,FromPort,ToPort\n")
+        if log_format == "binary":
+            self.log_path = f"logs/{experiment_dir}/{name}_log/events.bin"
+            self.log = BinaryEventLog(self.log_path)
+            if self.clock is not None:
+                print(f"[INFO] The {clock} clock is only logged in the CSV format")
+        else:
+            self.log_path = f"logs/{experiment_dir}/{name}_log/events.csv"
+            self.log = CsvEventLog(self.log_path, clock_column=self.clock is not None)
+        if log_writer == "thread":
+            self.log = ThreadedEventLog(self.log, capacity=log_buffer, policy=log_policy)
+
+    # Appends a "Key: value" line to the metadata file
+    def write_metadata(self, key, value):
+        with open(self.md_path, 'a') as md:
+            md.write(f"{key}: {value}\n")
+
+    # Anchors the tick schedule: tick k is due at start_time + k/clock_speed
+    def start(self, start_time):
+        self.start_time = start_time
+        self.next_deadline = start_time
+
+    # Effective vs configured clock speed, tick lateness and drift, in md.txt
+    def write_tick_stats(self):
+        elapsed = self.last_available - self.start_time
+        self.write_metadata("Scheduler", self.scheduler)
+        self.write_metadata("Effective Clock Speed", (self.ticks_run - 1) / elapsed if elapsed > 0 else 0)
+        self.write_metadata("Mean Tick Lateness", self.lateness_sum / self.ticks_run)
+        self.write_metadata("Max Tick Lateness", self.lateness_max)
+        self.write_metadata("Schedule Drift", self.drift)
+        self.write_metadata("Max Schedule Drift", self.drift_max)
+        self.write_metadata("Tick Overruns", self.overruns)
 
     # Determines whether the client is available to process an event
     def update_availability(self):
-        if not self.is_available and self.time - self.last_available > 1/ self.clock_speed:
-            self.is_available = True
-            self.ticks += 1
+        if self.is_available:
+            return
+        if self.scheduler == "absolute":
+            if self.time >= self.next_deadline:
+                self.advance()
+        elif self.time - self.last_available > 1/ self.clock_speed:
+            self.advance()
+
+    # Starts the next clock tick
+    def advance(self):
+        self.is_available = True
+        self.ticks += 1
 
     # After performing an event, the client is set to unavailable
     def set_unavailable(self):
         self.is_available = False
+        previous = self.last_available
         self.last_available = self.time
 
+        # Drift of this tick from its absolute deadline, in either scheduler mode
+        if self.start_time is None:
+            self.start(self.time)
+        self.drift = self.time - self.next_deadline
+        if self.drift > self.drift_max:
+            self.drift_max = self.drift
+        # Lateness against what the scheduler aimed for: the absolute deadline,
+        # or a period after the previous tick
+        if self.scheduler == "absolute" or self.ticks_run == 0:
+            lateness = self.drift
+        else:
+            lateness = self.time - (previous + 1 / self.clock_speed)
+        self.lateness_sum += lateness
+        if lateness > self.lateness_max:
+            self.lateness_max = lateness
+        if lateness > 1 / self.clock_speed:
+            # Later than a whole period: the tick missed its slot
+            self.overruns += 1
+        self.ticks_run += 1
+        self.next_deadline = self.start_time + self.ticks_run / self.clock_speed
+        if self.metrics is not None:
+            self.metrics.tick(lateness, len(self.network_queue))
+
+    # The extra clock's value for the log, if there is one
+    def clock_value(self):
+        return None if self.clock is None else self.clock.format()
+
     # Log an internal event
     def internal_event(self):
-        string = f"{Events.INTERNAL_EVENT},{self.time},{self.ticks},{len(self.network_queue)},NULL,NULL\n"
-        self.log.write(string)
+        if self.clock is not None:
+            self.clock.local(self.time)
+        self.log.record(Events.INTERNAL_EVENT, self.time, self.ticks, len(self.network_queue), None, None,
+                        self.clock_value())
 
     # Message is a dictionary
     def send_message(self, message, ports):
         """Sends the given message to the specified port."""
-        for port in ports:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                try:
-                    s.connect((self.host, port))
-                    s.sendall(json.dumps(message).encode('utf-8'))
-                    if self.logging:
-                        print(f"[INFO] Sent message to port {port}: {message}")
-                except Exception as e:
-                    print(f"[ERROR] Could not send message to port {port}: {e}")
+        if isinstance(ports, int):
+            ports = [ports]
+
+        # With an extra clock each peer gets its own stamp (vector deltas differ per peer)
+        if self.clock is None:
+            messages = [message] * len(ports)
+        else:
+            self.clock.local(self.time)
+            if self.pooled and isinstance(self.clock, VectorClock):
+                # A new connection may follow a dropped one, so it starts with a full vector
+                for port in ports:
+                    if port not in self.peer_sockets:
+                        self.clock.lost(port)
+            messages = [dict(message, clock=self.clock.stamp(port)) for port in ports]
+
+        metrics = self.metrics
+        send_ports = ports
+        if self.shm is not None:
+            # Whatever doesn't fit in a peer's shared-memory lane goes over TCP below
+            rest = []
+            for port, message in zip(ports, messages):
+                start = time.perf_counter()
+                if self.shm.send(port, message):
+                    if metrics is not None:
+                        metrics.sent(port, time.perf_counter() - start)
+                else:
+                    rest.append((port, message))
+            send_ports = [port for port, _ in rest]
+            messages = [message for _, message in rest]
+
+        if self.sender is not None:
+            for port, message in zip(send_ports, messages):
+                start = time.perf_counter()
+                self.sender(port, message)
+                if metrics is not None:
+                    metrics.sent(port, time.perf_counter() - start)
+        elif self.pooled and self.coalesce:
+            # Timed when the outbox is flushed
+            for port, message in zip(send_ports, messages):
+                self.outbox.setdefault(port, []).append(message)
+        elif self.pooled:
+            frame = encode_messages([message], self.wire) if self.clock is None else None
+            for port, message in zip(send_ports, messages):
+                start = time.perf_counter()
+                if not self.send_pooled(port, frame or encode_messages([message], self.wire)) and self.clock is not None:
+                    self.clock.lost(port)
+                if metrics is not None:
+                    metrics.sent(port, time.perf_counter() - start)
+                if self.logging:
+                    print(f"[INFO] Sent message to port {port}: {message}")
+        else:
+            for port, message in zip(send_ports, messages):
+                start = time.perf_counter()
+                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                    try:
+                        s.connect((self.host, port))
+                        s.sendall(json.dumps(message).encode('utf-8'))
+                        if self.logging:
+                            print(f"[INFO] Sent message to port {port}: {message}")
+                    except Exception as e:
+                        print(f"[ERROR] Could not send message to port {port}: {e}")
+                if metrics is not None:
+                    metrics.sent(port, time.perf_counter() - start)
 
         # Log event,send time, ticks, queue length, from port, to port
         if len(ports) == 1:
-            port = ports[0]
-            string = f"{Events.SENT_MSG},{self.time},{self.ticks},{len(self.network_queue)},{self.port},{port}\n"
+            self.log.record(Events.SENT_MSG, self.time, self.ticks, len(self.network_queue), self.port, ports[0],
+                            self.clock_value())
         else:
-            string = f"{Events.BROADCAST_MSG},{self.time},{self.ticks},{len(self.network_queue)},{self.port},{':'.join([str(x) for x in ports])}\n"
-        self.log.write(string)
+            self.log.record(Events.BROADCAST_MSG, self.time, self.ticks, len(self.network_queue), self.port, list(ports),
+                            self.clock_value())
+
+    # Sends everything queued for each peer since the last flush in one write per peer
+    def flush_outbox(self):
+        for port, messages in self.outbox.items():
+            start = time.perf_counter()
+            if not self.send_pooled(port, encode_messages(messages, self.wire)) and self.clock is not None:
+                self.clock.lost(port)
+            if self.metrics is not None:
+                self.metrics.sent(port, time.perf_counter() - start, len(messages))
+            self.coalesced += len(messages) - 1
+            if self.logging:
+                print(f"[INFO] Sent {len(messages)} messages to port {port}")
+        self.outbox.clear()
+
+    def send_pooled(self, port, frame):
+        """
+            Writes a frame on the persistent connection to port, (re)connecting
+            lazily. Returns False if this frame, or an earlier one lost with a
+            dropped connection, may not reach the peer.
+        """
+        s = self.peer_sockets.get(port)
+        dropped = False
+        if s is not None:
+            try:
+                s.sendall(frame)
+                self.reuses += 1
+                return True
+            except OSError:
+                # The peer dropped the connection; reconnect below
+                s.close()
+                del self.peer_sockets[port]
+                dropped = True
+
+        try:
+            s = socket.create_connection((self.host, port))
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            s.sendall(frame)
+            self.peer_sockets[port] = s
+            self.connects += 1
+            return not dropped
+        except OSError as e:
+            print(f"[ERROR] Could not send message to port {port}: {e}")
+            return False
+
+    def pool_stats(self):
+        return {"connects": self.connects, "reuses": self.reuses, "open": len(self.peer_sockets),
+                "coalesced": self.coalesced}
 
     def await_message(self):
         """
@@ -108,10 +437,23 @@ class ClientProcess:
         """
         if self.logging:
             print(f"[INFO] Waiting for a message on port {self.port} ...")
+        if self.pooled:
+            if not self.pending:
+                batch = self.await_messages()
+                if batch is None:
+                    return
+                self.pending.extend(batch)
+            return self.pending.popleft()
         try:
             conn, addr = self.server_socket.accept()
             with conn:
-                data = conn.recv(1024)
+                # The sender closes after one message, so read until EOF
+                data = bytearray()
+                while True:
+                    chunk = conn.recv(4096)
+                    if not chunk:
+                        break
+                    data += chunk
                 # Message is a dictionary
                 message = json.loads(data.decode('utf-8'))
                 if self.logging:
@@ -121,10 +463,84 @@ class ClientProcess:
         except Exception as e:
             return
 
+    def await_messages(self):
+        """
+        Waits for framed messages on the persistent inbound connections and
+        returns every complete frame read so far as a list, or None once the
+        server socket is closed.
+        """
+        if self.selector is None:
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(self.server_socket, selectors.EVENT_READ)
+        # Wake up periodically so close() from another thread is noticed
+        while not self.closed:
+            batch = []
+            try:
+                events = self.selector.select(timeout=0.5)
+            except (OSError, ValueError):
+                # close() shut the sockets while we were waiting on them
+                if self.closed:
+                    break
+                raise
+            for key, _ in events:
+                s = key.fileobj
+                if s is self.server_socket:
+                    try:
+                        conn, addr = s.accept()
+                    except OSError:
+                        continue
+                    conn.setblocking(False)
+                    self.inbound[conn] = bytearray()
+                    self.selector.register(conn, selectors.EVENT_READ)
+                    continue
+
+                try:
+                    data = s.recv(65536)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    data = b''
+                if data:
+                    buf = self.inbound[s]
+                    buf += data
+                    try:
+                        decode_frames(buf, batch)
+                        continue
+                    except (KeyError, ValueError, struct.error) as e:
+                        # Frames decoded before the bad one stay in batch
+                        print(f"[ERROR] Dropping a connection that sent an undecodable frame: {e}")
+                # Peer hung up or sent garbage; drop only this connection and any partial frame
+                self.selector.unregister(s)
+                del self.inbound[s]
+                s.close()
+
+            if batch:
+                if self.logging:
+                    print(f"[INFO] Received {len(batch)} messages")
+                return batch
+        self.selector.close()
+        return None
+
     # Fast queue adds messages outside of the clock ticks
     def append_message(self, message):
         self.network_queue.append(message)
 
+    # Moves messages written to our shared-memory inbox onto the queue; runners call it every tick
+    def drain_shared(self):
+        if self.shm is not None:
+            messages = self.shm.drain()
+            if messages:
+                self.append_messages(messages)
+
+    # block: wait for room in a bounded queue instead of dropping (listener threads only)
+    def append_messages(self, messages, block=False):
+        self.network_queue.extend(messages, block)
+
+    def queue_stats(self):
+        return {"policy": self.queue_policy, "length": len(self.network_queue),
+                "high_water": self.network_queue.high_water, "dropped": self.network_queue.dropped,
+                "coalesced": self.network_queue.coalesced}
+
     # Clock reads message from the queue
     def read_message(self):
         message = self.network_queue.popleft()
@@ -135,15 +551,58 @@ class ClientProcess:
             self.ticks = msg_tick
 
         from_port = message["port"]
+        if self.clock is not None:
+            self.clock.receive(message.get("clock"), self.time)
+        if self.metrics is not None:
+            self.metrics.received()
 
         # Log the event
-        string = f"{Events.RECEIVED_MSG},{self.time},{self.ticks},{len(self.network_queue)},{from_port},{self.port}\n"
-
-        self.log.write(string)
+        self.log.record(Events.RECEIVED_MSG, self.time, self.ticks, len(self.network_queue), from_port, self.port,
+                        self.clock_value())
 
         return message
 
+    def metrics_snapshot(self):
+        """The agent's live metrics plus its queue and pool counters and log size, as a dict."""
+        snapshot = self.metrics.snapshot()
+        snapshot["name"] = self.name
+        snapshot["port"] = self.port
+        snapshot["lamport"] = self.ticks
+        snapshot["counters"]["log_bytes"] = os.path.getsize(self.log_path)
+        snapshot["counters"]["queue_length"] = len(self.network_queue)
+        snapshot["counters"]["queue_dropped"] = self.network_queue.dropped
+        snapshot["counters"]["queue_coalesced"] = self.network_queue.coalesced
+        snapshot["counters"]["connects"] = self.connects
+        return snapshot
+
     def close(self):
-        self.server_socket.close()
+        self.flush_outbox()
+        self.closed = True
+        # Release a listener waiting for room in a bounded queue
+        self.network_queue.close()
+        for s in list(self.peer_sockets.values()) + list(self.inbound):
+            s.close()
+        self.peer_sockets.clear()
+        self.inbound.clear()
+        if self.server_socket is not None:
+            # Shutting down first wakes a listener thread blocked in accept/select
+            try:
+                self.server_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.server_socket.close()
         self.log.close()
+        if self.ticks_run > 1:
+            self.write_tick_stats()
+        self.write_metadata("Queue Policy", self.queue_policy)
+        self.write_metadata("Queue High Water", self.network_queue.high_water)
+        self.write_metadata("Queue Dropped", self.network_queue.dropped)
+        self.write_metadata("Queue Coalesced", self.network_queue.coalesced)
+        if self.shm is not None:
+            self.write_metadata("Shared Memory Sends", self.shm.sent)
+            self.write_metadata("Shared Memory Fallbacks", self.shm.fallbacks)
+            self.shm.close()
+        if isinstance(self.log, ThreadedEventLog):
+            self.write_metadata("Log Buffer High Water", self.log.high_water)
+            self.write_metadata("Log Events Dropped", self.log.dropped)
 
@@ -0,0 +1,202 @@
+import time
+import random
+import argparse
+from array import array
+
+"""
+    Optional clocks kept alongside the Lamport ticks. ClientProcess.ticks
+    stays the Lamport clock that every log, plot and summary uses; a clock
+    from here is advanced on the same events, travels in messages under
+    "clock" and is logged in an extra Clock column of events.csv.
+
+    Every clock has the same four methods:
+        local(now): a local or send event
+        stamp(port): the value to attach to a message for port, after local()
+        receive(stamp, now): a receive event for a message carrying stamp
+        format(): the current value as a string for the log
+"""
+
+"""
+    Vector clock over every agent of the experiment, indexed by sorted port
+    and stored in one int64 array. Stamps are delta-encoded per peer: a
+    message to a peer only carries the entries that changed since our last
+    message to it, as a flat [index, value, index, value, ...] list, so the
+    cost of a broadcast grows with how much changed rather than with the
+    number of agents. When the delta would not be shorter than the whole
+    vector, the whole vector is sent instead; a stamp is a full vector
+    exactly when it has one entry per agent. Deltas assume FIFO channels
+    per peer (pooled connections, host.py and the simulator without
+    jitter); with one-shot connections a message may be merged before one
+    sent ahead of it.
+"""
+class VectorClock:
+    def __init__(self, port, ports):
+        self.ports = sorted(set(ports) | {port})
+        self.index = {p: i for i, p in enumerate(self.ports)}
+        self.me = self.index[port]
+        self.values = array('q', bytes(8 * len(self.ports)))
+        # Local event count, and entry index -> event count at its last change,
+        # ordered oldest change first
+        self.events = 0
+        self.changed = {}
+        # Peer port -> event count at our last message to it
+        self.last_sent = {}
+
+    def update(self, i, value):
+        self.values[i] = value
+        self.changed.pop(i, None)
+        self.changed[i] = self.events
+
+    def local(self, now=None):
+        self.events += 1
+        self.update(self.me, self.values[self.me] + 1)
+
+    def stamp(self, port):
+        since = self.last_sent.get(port, 0)
+        self.last_sent[port] = self.events
+        n = len(self.values)
+        delta = []
+        for i in reversed(self.changed):
+            if self.changed[i] <= since:
+                break
+            if len(delta) + 2 >= n:
+                return self.values.tolist()
+            delta += (i, self.values[i])
+        return delta
+
+    # A message to port may not have arrived, so the next stamp for it must be full
+    def lost(self, port):
+        self.last_sent.pop(port, None)
+
+    def receive(self, stamp, now=None):
+        self.events += 1
+        values = self.values
+        if stamp is not None and len(stamp) == len(values):
+            for i, value in enumerate(stamp):
+                if value > values[i]:
+                    self.update(i, value)
+        elif stamp is not None:
+            for k in range(0, len(stamp), 2):
+                i, value = stamp[k], stamp[k + 1]
+                if value > values[i]:
+                    self.update(i, value)
+        self.update(self.me, values[self.me] + 1)
+
+    def format(self):
+        return ":".join(map(str, self.values))
+
+"""
+    Hybrid logical clock: l follows the largest physical time seen (in
+    integer microseconds) and c counts events that share an l, so stamps
+    stay close to wall time while still respecting causality.
+"""
+class HybridClock:
+    def __init__(self, port=None, ports=None):
+        self.l = 0
+        self.c = 0
+
+    def local(self, now):
+        pt = int(now * 1e6)
+        if pt > self.l:
+            self.l, self.c = pt, 0
+        else:
+            self.c += 1
+
+    def stamp(self, port):
+        return [self.l, self.c]
+
+    def receive(self, stamp, now):
+        if stamp is None:
+            self.local(now)
+            return
+        pt = int(now * 1e6)
+        lm, cm = stamp
+        l = max(self.l, lm, pt)
+        if l == self.l and l == lm:
+            c = max(self.c, cm) + 1
+        elif l == self.l:
+            c = self.c + 1
+        elif l == lm:
+            c = cm + 1
+        else:
+            c = 0
+        self.l, self.c = l, c
+
+    def format(self):
+        return f"{self.l}:{self.c}"
+
+# Config value -> clock class; "lamport" adds nothing beyond ClientProcess.ticks
+CLOCKS = {"lamport": None, "vector": VectorClock, "hlc": HybridClock}
+
+def make_clock(kind, port, ports):
+    if kind not in CLOCKS:
+        raise ValueError(f"Unknown clock: {kind}")
+    cls = CLOCKS[kind]
+    return None if cls is None else cls(port, ports)
+
+def parse_vector(value):
+    """Parses a logged vector clock ("3:0:5") back into a list of ints."""
+    return [int(x) for x in value.split(":")]
+
+def happened_before(a, b):
+    """True if the event with vector clock a causally precedes the one with b."""
+    return all(x <= y for x, y in zip(a, b)) and a != b
+
+def bench_clocks(n_agents=60, messages=20000, broadcast=0.1, seed=0):
+    """
+        Per-message overhead of each clock: random agents send a unicast or,
+        with probability broadcast, a broadcast, and every recipient merges
+        the stamp at once. Returns {clock: {"us_per_message", "entries_per_message"}},
+        where entries counts the ints a stamp carries on the wire.
+    """
+    rng = random.Random(seed)
+    ports = list(range(50000, 50000 + n_agents))
+    traffic = []
+    while len(traffic) < messages:
+        sender = rng.choice(ports)
+        if rng.random() < broadcast:
+            traffic.append((sender, [p for p in ports if p != sender]))
+        else:
+            traffic.append((sender, [rng.choice([p for p in ports if p != sender])]))
+
+    results = {}
+    for kind in CLOCKS:
+        clocks = {port: make_clock(kind, port, ports) for port in ports}
+        ticks = dict.fromkeys(ports, 0)
+        sent = 0
+        entries = 0
+        start = time.perf_counter()
+        for sender, recipients in traffic:
+            now = time.time()
+            if kind == "lamport":
+                # The existing scalar rule, for reference
+                ticks[sender] += 1
+                for port in recipients:
+                    ticks[port] = max(ticks[port], ticks[sender])
+                    entries += 1
+            else:
+                clocks[sender].local(now)
+                for port in recipients:
+                    stamp = clocks[sender].stamp(port)
+                    clocks[port].receive(stamp, now)
+                    entries += len(stamp)
+            sent += len(recipients)
+        elapsed = time.perf_counter() - start
+        results[kind] = {"us_per_message": elapsed / sent * 1e6, "entries_per_message": entries / sent}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-message overhead of each clock.")
+    # -n or --agents : comma-separated agent counts
+    parser.add_argument("-n", "--agents", type=str, default="60,200", help="Comma-separated agent counts.")
+    # -m or --messages : send events per run
+    parser.add_argument("-m", "--messages", type=int, default=20000, help="Send events per run.")
+    args = parser.parse_args()
+
+    print("Agents,Clock,UsPerMessage,EntriesPerMessage")
+    for n in [int(x) for x in args.agents.split(",")]:
+        for kind, stats in bench_clocks(n, args.messages).items():
+            print(f"{n},{kind},{stats['us_per_message']:.3f},{stats['entries_per_message']:.2f}")
+
+if __name__ == '__main__':
+    main()
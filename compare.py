@@ -0,0 +1,117 @@
+import os
+import sys
+import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from summaries import load_summary
+
+"""
+    Compares many experiments at once. Each logs/<experiment>/ is
+    summarized in its own worker process through the summaries.py cache,
+    which loads one agent's log at a time, and only the reduced row comes
+    back. Columns follow batch_sim.py's sweep table so live runs and
+    simulated sweeps can be put side by side.
+"""
+
+COMPARE_COLUMNS = ["experiment", "agents", "clock_speeds", "speed_ratio", "randn_UB",
+                   "drift_mean", "drift_max", "drift_final", "jump_mean", "jump_slowest",
+                   "queue_max", "queue_mean", "queue_growth"]
+
+def compare_experiment(base_dir, step=1.0):
+    """Reduces one experiment to a single row of drift, jump size and queue statistics."""
+    summary = load_summary(base_dir, step)
+    agents = list(summary["agents"].values())
+    speeds = [stats["metadata"].get("Clock Speed") for stats in agents]
+    speeds = [s for s in speeds if isinstance(s, float)]
+    # Logs written before "Randn UB" was recorded leave the column empty
+    randn_ubs = {stats["metadata"].get("Randn UB") for stats in agents} - {None}
+    spread = summary["experiment"]["spread"]
+
+    row = {
+        "experiment": os.path.basename(os.path.normpath(base_dir)),
+        "agents": len(agents),
+        "clock_speeds": ":".join(f"{s:g}" for s in sorted(set(speeds))),
+        "speed_ratio": max(speeds) / min(speeds) if speeds and min(speeds) > 0 else None,
+        "randn_UB": int(randn_ubs.pop()) if len(randn_ubs) == 1 else None,
+        "drift_mean": float(np.mean(spread)) if spread else None,
+        "drift_max": float(np.max(spread)) if spread else None,
+        "drift_final": float(spread[-1]) if spread else None,
+        "jump_mean": float(np.mean([stats["jump_mean"] for stats in agents])) if agents else None,
+        "jump_slowest": None,
+        "queue_max": max([stats["queue_max"] for stats in agents], default=None),
+        "queue_mean": float(np.mean([stats["queue_mean"] for stats in agents])) if agents else None,
+        # The fastest-growing queue, which belongs to the agent falling behind
+        "queue_growth": max([stats["queue_growth"] for stats in agents], default=None),
+    }
+    if speeds and len(speeds) == len(agents):
+        row["jump_slowest"] = agents[int(np.argmin(speeds))]["jump_mean"]
+    return row
+
+def compare(base_dirs, jobs=None, step=1.0):
+    """Summarizes every experiment, one per worker process, returning rows in input order."""
+    if jobs == 1:
+        return [compare_experiment(base_dir, step) for base_dir in base_dirs]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(compare_experiment, base_dirs, [step] * len(base_dirs)))
+
+def write_table(rows, out):
+    out.write(",".join(COMPARE_COLUMNS) + "\n")
+    for row in rows:
+        out.write(",".join("" if row[c] is None else str(row[c]) for c in COMPARE_COLUMNS) + "\n")
+
+def plot_comparison(rows, out_path):
+    """Drift, queue growth and jump size against the clock-speed ratio, one color per randn_UB."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, 3, figsize=(16, 4.5))
+    metrics = [("drift_mean", "Mean clock spread"), ("queue_growth", "Queue growth (msgs/s)"),
+               ("jump_mean", "Mean jump size")]
+    randn_ubs = sorted({row["randn_UB"] for row in rows}, key=lambda ub: (ub is None, ub))
+    for ax, (metric, label) in zip(axes, metrics):
+        for ub in randn_ubs:
+            points = [(row["speed_ratio"], row[metric]) for row in rows
+                      if row["randn_UB"] == ub and row["speed_ratio"] is not None and row[metric] is not None]
+            if points:
+                x, y = zip(*points)
+                ax.scatter(x, y, label=f"randn_UB = {ub if ub is not None else '?'}")
+        ax.set_xlabel("Clock speed ratio (max / min)")
+        ax.set_ylabel(label)
+    axes[0].legend()
+    fig.suptitle("Experiment comparison", fontsize=16, fontweight='bold')
+    fig.tight_layout()
+    fig.savefig(out_path)
+    plt.close(fig)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare drift, queue growth and jump size across experiments.")
+    # positional : experiment names or globs under logs/ (default: every experiment)
+    parser.add_argument("experiments", nargs="*", default=["*"], help="Experiment names or globs.")
+    # -j or --jobs : number of worker processes (default: one per core)
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes.")
+    # -o or --output : CSV file for the table (default: print it)
+    parser.add_argument("-o", "--output", type=str, default=None, help="CSV file for the comparison table.")
+    # -p or --plot : also write the comparison plot to this file
+    parser.add_argument("-p", "--plot", type=str, default=None, help="Path of the comparison plot, e.g. compare.png.")
+    args = parser.parse_args()
+
+    base_dirs = sorted({path for pattern in args.experiments
+                        for path in glob.glob(os.path.join("logs", pattern)) if os.path.isdir(path)})
+    if not base_dirs:
+        print("[ERROR] No matching experiments under logs/.")
+        exit(1)
+
+    rows = compare(base_dirs, args.jobs)
+    if args.output is None:
+        write_table(rows, sys.stdout)
+    else:
+        with open(args.output, 'w') as f:
+            write_table(rows, f)
+        print(f"[INFO] Compared {len(rows)} experiments into {args.output}")
+    if args.plot is not None:
+        plot_comparison(rows, args.plot)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+import sys
+import struct
+import threading
+from collections import deque
+from enum import Enum
+import numpy as np
+
+# Create an enum
+class Events(Enum):
+    RECEIVED_MSG = 1
+    SENT_MSG = 2
+    INTERNAL_EVENT = 3
+    BROADCAST_MSG = 4
+
+# str(Events.X) is slow enough to show up in the tick loop, so format once
+EVENT_NAMES = {event: str(event) for event in Events}
+
+COLUMNS = ["Event", "TimeGlob", "TimeLocal", "QueueLen", "FromPort", "ToPort"]
+
+"""
+    Binary log layout: an 8-byte magic followed by fixed-width 32-byte
+    little-endian records. FromPort/ToPort are -1 where the CSV has NULL,
+    and ToPort is 0 for a broadcast (the recipient list isn't kept).
+"""
+MAGIC = b"LCEVT001"
+RECORD = struct.Struct("<dqiiiB3x")
+RECORD_DTYPE = np.dtype({
+    "names": ["TimeGlob", "TimeLocal", "QueueLen", "FromPort", "ToPort", "Event"],
+    "formats": ["<f8", "<i8", "<i4", "<i4", "<i4", "u1"],
+    "offsets": [0, 8, 16, 20, 24, 28],
+    "itemsize": RECORD.size,
+})
+NULL_PORT = -1
+BROADCAST_PORT = 0
+
+def format_port(port):
+    if port is None:
+        return "NULL"
+    if isinstance(port, list):
+        return ':'.join([str(x) for x in port])
+    return port
+
+"""
+    The original text log: one CSV row per event. With clock_column, rows
+    end with the agent's extra clock (see clocks.py) in a Clock column.
+"""
+class CsvEventLog:
+    def __init__(self, path, clock_column=False):
+        self.path = path
+        self.clock_column = clock_column
+        self.file = open(path, 'w')
+        self.file.write(",".join(COLUMNS + ["Clock"] if clock_column else COLUMNS) + "\n")
+
+    def record(self, event, time, ticks, queue_len, from_port, to_port, clock=None):
+        row = f"{EVENT_NAMES[event]},{time},{ticks},{queue_len},{format_port(from_port)},{format_port(to_port)}"
+        if self.clock_column:
+            row += f",{clock}"
+        self.file.write(row + "\n")
+
+    def write(self, string):
+        return self.file.write(string)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+"""
+    Compact binary log: records are packed into a preallocated buffer and
+    written batch_size at a time. Records are fixed-width, so an extra
+    clock is not kept.
+"""
+class BinaryEventLog:
+    def __init__(self, path, batch_size=1024):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.buffer = bytearray(RECORD.size * batch_size)
+        self.batch_size = batch_size
+        self.count = 0
+
+    def record(self, event, time, ticks, queue_len, from_port, to_port, clock=None):
+        if from_port is None:
+            from_port = NULL_PORT
+        if to_port is None:
+            to_port = NULL_PORT
+        elif isinstance(to_port, list):
+            to_port = BROADCAST_PORT
+        RECORD.pack_into(self.buffer, self.count * RECORD.size,
+                         time, ticks, queue_len, from_port, to_port, event.value)
+        self.count += 1
+        if self.count == self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(memoryview(self.buffer)[:self.count * RECORD.size])
+        self.count = 0
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+        self.file.close()
+
+"""
+    Moves formatting and disk writes off the tick thread. record() only
+    appends the raw event tuple to a bounded buffer; a writer thread swaps
+    the buffer out and hands the whole batch to the wrapped CSV or binary
+    log. policy decides what record() does when the buffer is full:
+        "block": wait for the writer to make room
+        "drop": discard the event and count it in self.dropped
+        "grow": let the buffer exceed its capacity
+    close() drains everything still buffered before closing the sink.
+"""
+class ThreadedEventLog:
+    def __init__(self, sink, capacity=65536, policy="block", flush_interval=0.5):
+        if policy not in ("block", "drop", "grow"):
+            raise ValueError(f"Unknown log buffer policy: {policy}")
+        self.sink = sink
+        self.path = sink.path
+        self.capacity = capacity
+        self.policy = policy
+        self.flush_interval = flush_interval
+        self.buffer = deque()
+        self.dropped = 0
+        self.high_water = 0
+        self.closed = False
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        # Number of flush() callers waiting for the writer to catch up
+        self.flush_requests = 0
+        self.flushed = threading.Condition(self.lock)
+        self.writer = threading.Thread(target=self.run, daemon=True)
+        self.writer.start()
+
+    def record(self, *event):
+        with self.lock:
+            if self.closed:
+                raise ValueError("I/O operation on closed event log.")
+            if len(self.buffer) >= self.capacity:
+                if self.policy == "drop":
+                    self.dropped += 1
+                    return
+                if self.policy == "block":
+                    while len(self.buffer) >= self.capacity and not self.closed:
+                        self.not_full.wait()
+            self.buffer.append(event)
+            if len(self.buffer) > self.high_water:
+                self.high_water = len(self.buffer)
+            if len(self.buffer) == 1:
+                self.not_empty.notify()
+
+    def run(self):
+        while True:
+            with self.lock:
+                if not self.buffer and not self.closed and not self.flush_requests:
+                    self.not_empty.wait(self.flush_interval)
+                batch = self.buffer
+                self.buffer = deque()
+                self.not_full.notify_all()
+                done = self.closed
+                flush_requested = self.flush_requests > 0
+
+            for event in batch:
+                self.sink.record(*event)
+            if batch or flush_requested:
+                self.sink.flush()
+
+            with self.lock:
+                if flush_requested and not self.buffer:
+                    self.flush_requests = 0
+                    self.flushed.notify_all()
+                if done and not self.buffer:
+                    return
+
+    def flush(self):
+        """Blocks until every event recorded so far has been written out."""
+        with self.lock:
+            self.flush_requests += 1
+            self.not_empty.notify()
+            while self.flush_requests:
+                self.flushed.wait()
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.not_empty.notify()
+            self.not_full.notify_all()
+        self.writer.join()
+        self.sink.close()
+
+def read_binary_log(path):
+    """Memory-maps a binary log and returns its columns as NumPy arrays, keyed like the CSV header."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a binary event log")
+        f.seek(0, 2)
+        # Ignore a trailing partial record left by an interrupted writer
+        n = (f.tell() - len(MAGIC)) // RECORD.size
+    if n == 0:
+        records = np.zeros(0, dtype=RECORD_DTYPE)
+    else:
+        records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=len(MAGIC), shape=(n,))
+    return {column: records[column] for column in COLUMNS}
+
+def binary_to_csv(path, csv_path):
+    """Converts a binary log to the CSV format, with ALL as the ToPort of broadcasts."""
+    columns = read_binary_log(path)
+    names = {event.value: str(event) for event in Events}
+    with open(csv_path, 'w') as f:
+        f.write(",".join(COLUMNS) + "\n")
+        for event, time, ticks, queue_len, from_port, to_port in zip(*[columns[c].tolist() for c in COLUMNS]):
+            from_port = "NULL" if from_port == NULL_PORT else from_port
+            to_port = "NULL" if to_port == NULL_PORT else ("ALL" if to_port == BROADCAST_PORT else to_port)
+            f.write(f"{names[event]},{time},{ticks},{queue_len},{from_port},{to_port}\n")
+
+if __name__ == '__main__':
+    # python eventlog.py logs/<experiment>/<name>_log/events.bin [...] writes events.csv next to each
+    for path in sys.argv[1:]:
+        csv_path = path[:-len(".bin")] + ".csv" if path.endswith(".bin") else path + ".csv"
+        binary_to_csv(path, csv_path)
+        print(f"[INFO] Wrote {csv_path}")
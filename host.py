@@ -0,0 +1,222 @@
+import os
+import time
+import argparse
+import asyncio
+import resource
+import socket
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+from runner import load_config, make_client
+from async_runner import AsyncPeerPool, FrameServer, start_ticking
+from metrics import MetricsServer
+
+"""
+    Runs every agent of an experiment inside one interpreter, or sharded
+    across a few worker processes. Agents in the same shard exchange
+    messages through an in-memory channel; messages for agents in another
+    shard go over one pooled loopback connection per shard pair, addressed
+    by the destination agent's port.
+"""
+
+# Seconds a shard waits at the start barrier for the others before giving up
+BARRIER_TIMEOUT = 60.0
+
+# Seconds past the run a worker gets to shut down before it is stopped
+SHUTDOWN_GRACE = 30.0
+
+def load_experiment(config_dir):
+    paths = sorted(os.listdir(config_dir))
+    return [load_config(os.path.join(config_dir, path)) for path in paths if path.endswith(".yaml")]
+
+# Binds one listening socket per shard for cross-shard traffic. Done in the
+# parent so every shard knows every gateway before any agent starts.
+def bind_gateways(n_shards):
+    gateways = []
+    for _ in range(n_shards):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(128)
+        gateways.append(sock)
+    return gateways
+
+"""
+    Routes a message to the destination agent: appended straight onto its
+    queue when it lives in this shard, otherwise framed to the owning shard's
+    gateway with a "to" field naming the agent.
+"""
+class ShardRouter:
+    def __init__(self, agents, shard_of, gateway_ports, host, wire="json", coalesce=False):
+        self.agents = agents
+        self.shard_of = shard_of
+        self.gateway_ports = gateway_ports
+        self.pool = AsyncPeerPool(host, wire, coalesce)
+        self.local_sends = 0
+        self.remote_sends = 0
+
+    # Matches the ClientProcess.sender signature
+    def send(self, port, message):
+        agent = self.agents.get(port)
+        if agent is not None:
+            agent.append_message(message)
+            self.local_sends += 1
+        elif port in self.shard_of:
+            self.pool.send(self.gateway_ports[self.shard_of[port]], dict(message, to=port))
+            self.remote_sends += 1
+        else:
+            print(f"[ERROR] Could not send message to port {port}: unknown agent")
+
+    # Delivers a batch received on this shard's gateway
+    def deliver(self, batch):
+        for message in batch:
+            self.agents[message.pop("to")].append_message(message)
+
+async def run_shard_async(configs, shard_of, gateways, shard, time_limit, barrier, metrics_port=None):
+    agents = {}
+    for config in configs:
+        agents[config['port']] = make_client(config, listen=False, metrics=metrics_port is not None)
+
+    gateway_ports = [sock.getsockname()[1] for sock in gateways]
+    # Cross-shard traffic uses the experiment's wire settings
+    router = ShardRouter(agents, shard_of, gateway_ports, '127.0.0.1',
+                         configs[0].get('wire_format', 'json'), configs[0].get('coalesce', False))
+    for communicator in agents.values():
+        communicator.sender = router.send
+
+    server = None
+    metrics_server = None
+    try:
+        if len(gateways) > 1:
+            server = FrameServer(gateways[shard], router.deliver)
+            await server.start()
+
+        # One endpoint per shard, at metrics_port + shard, covering all of its agents
+        if metrics_port is not None:
+            metrics_server = MetricsServer(metrics_port + shard,
+                                           lambda: [communicator.metrics_snapshot() for communicator in agents.values()])
+
+        # Start every shard's clocks together; raises BrokenBarrierError if a
+        # shard died or never showed up
+        if barrier is not None:
+            barrier.wait(BARRIER_TIMEOUT)
+
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[start_ticking(loop, agents[config['port']], config, time_limit) for config in configs])
+    finally:
+        if server is not None:
+            await server.close()
+        await router.pool.close()
+        if metrics_server is not None:
+            metrics_server.close()
+        for communicator in agents.values():
+            communicator.close()
+    print(f"[INFO] Shard {shard}: {len(agents)} agents, {router.local_sends} in-memory sends, "
+          f"{router.remote_sends} cross-shard sends ({router.pool.coalesced} coalesced)")
+
+def run_shard(configs, shard_of, gateways, shard, time_limit, barrier, metrics_port=None):
+    raise_fd_limit()
+    try:
+        asyncio.run(run_shard_async(configs, shard_of, gateways, shard, time_limit, barrier, metrics_port))
+    except threading.BrokenBarrierError:
+        print(f"[ERROR] Shard {shard}: the other shards did not reach the start barrier")
+        exit(1)
+
+# Each hosted agent keeps its log open, so 1000 agents exceed the usual 1024 fd limit
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+"""
+    Runs all configs for time_limit seconds across n_shards shards. A single
+    shard runs in this process; more shards each get a forked worker. With
+    metrics_port, shard i serves its agents' metrics on metrics_port + i.
+    Returns True if every shard exited cleanly.
+"""
+def run_host(configs, time_limit, n_shards=1, metrics_port=None):
+    n_shards = max(1, min(n_shards, len(configs)))
+    shards = [configs[i::n_shards] for i in range(n_shards)]
+    shard_of = {config['port']: i for i, shard in enumerate(shards) for config in shard}
+    gateways = bind_gateways(n_shards) if n_shards > 1 else []
+
+    if n_shards == 1:
+        run_shard(shards[0], shard_of, gateways, 0, time_limit, None, metrics_port)
+        return True
+
+    ctx = multiprocessing.get_context("fork")
+    barrier = ctx.Barrier(n_shards)
+    workers = [ctx.Process(target=run_shard, name=f"shard {i}",
+                           args=(shard, shard_of, gateways, i, time_limit, barrier, metrics_port))
+               for i, shard in enumerate(shards)]
+    try:
+        for worker in workers:
+            worker.start()
+        return supervise_shards(workers, barrier, time.time() + BARRIER_TIMEOUT + time_limit + SHUTDOWN_GRACE)
+    finally:
+        for sock in gateways:
+            sock.close()
+
+def supervise_shards(workers, barrier, deadline):
+    """
+        Waits for every worker to exit. If one fails, or any is still
+        running at deadline, the barrier is broken so no shard waits on it
+        and the other workers are stopped. Returns True if all exited cleanly.
+    """
+    running = {worker.sentinel: worker for worker in workers}
+    while running:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            print(f"[ERROR] {len(running)} shards still running at the deadline, stopping them")
+            stop_shards(workers, barrier)
+            return False
+        for sentinel in wait(list(running), remaining):
+            worker = running.pop(sentinel)
+            worker.join()
+            if worker.exitcode != 0:
+                print(f"[ERROR] {worker.name} exited with code {worker.exitcode}, stopping the other shards")
+                stop_shards(workers, barrier)
+                return False
+    return True
+
+def stop_shards(workers, barrier, timeout=5.0):
+    barrier.abort()
+    for worker in workers:
+        if worker.is_alive():
+            worker.terminate()
+    deadline = time.time() + timeout
+    for worker in workers:
+        worker.join(max(0.0, deadline - time.time()))
+        if worker.is_alive():
+            worker.kill()
+            worker.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run every agent of an experiment in one process.")
+    # -e or --experiment : name of the directory under configs/
+    parser.add_argument("-e", "--experiment", type=str, help="Experiment name.")
+    # -t or --time : time (seconds) to run the simulation
+    parser.add_argument("-t", "--time", type=int, default=120, help="Time to run the simulation in seconds.")
+    # -s or --shards : number of worker processes to spread the agents over
+    parser.add_argument("-s", "--shards", type=int, default=1, help="Number of worker processes.")
+    # -q or --quiet : skip the per-tick print
+    parser.add_argument("-q", "--quiet", action="store_true", help="Don't print every tick.")
+    # -m or --metrics-port : serve shard i's live metrics on this port + i
+    parser.add_argument("-m", "--metrics-port", type=int, default=None, help="First metrics endpoint port.")
+    args = parser.parse_args()
+
+    if args.experiment is None:
+        print("[ERROR] No experiment name provided.")
+        exit(1)
+
+    configs = load_experiment(f"configs/{args.experiment}/")
+    if args.quiet:
+        for config in configs:
+            config['quiet'] = True
+    start = time.time()
+    ok = run_host(configs, args.time, args.shards, args.metrics_port)
+    print(f"[INFO] Hosted {len(configs)} agents in {time.time() - start:.1f}s")
+    if not ok:
+        exit(1)
+
+if __name__ == '__main__':
+    main()
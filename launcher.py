@@ -0,0 +1,345 @@
+import os
+import sys
+import time
+import random
+import socket
+import argparse
+import heapq
+import itertools
+import multiprocessing
+from multiprocessing.connection import wait
+import yaml
+from runner import run_threaded, sleep_until
+from async_runner import run_async
+from host import run_host, raise_fd_limit
+
+"""
+    Generates and runs experiments without make_configs.sh and run_set.sh.
+    An experiment is described by a spec (name, agent count, clock speeds,
+    randn_UB and any extra config keys) and its configs are built in memory.
+    Agent ports are reserved by binding them in the launcher before any
+    agent starts, and the bound sockets are handed to the agents, so no
+    other process can take a port in between. Agents wait on a shared
+    start time instead of sleeping for a second, are supervised while they
+    run and are torn down together if one of them fails or overruns.
+
+    A matrix of experiments runs concurrently within a core budget: each
+    experiment runs in its own process and counts as many cores as it has
+    shards (host engine) or agent processes (threaded and asyncio engines).
+"""
+
+ENGINES = ["threaded", "asyncio", "host"]
+
+# First port to reserve. Linux hands out 32768-60999 to outgoing connections,
+# so ports are kept below that range.
+BASE_PORT = 21000
+EPHEMERAL_PORT = 32768
+
+def clock_speeds(spec, n, seed=0):
+    """
+        Expands a clock speed spec into n speeds:
+            [2, 3] or "2,3": listed speeds, the last one repeated for the rest
+            "uniform:1:3": random integers in [1, 3]
+            "choice:1,3,6": random picks from the list
+    """
+    rng = random.Random(seed)
+    if isinstance(spec, (int, float)):
+        return [spec] * n
+    if isinstance(spec, str):
+        kind, _, args = spec.partition(":")
+        if kind == "uniform":
+            lo, hi = (int(x) for x in args.split(":"))
+            return [rng.randint(lo, hi) for _ in range(n)]
+        if kind == "choice":
+            values = [float(x) if "." in x else int(x) for x in args.split(",")]
+            return [rng.choice(values) for _ in range(n)]
+        spec = [float(x) if "." in x else int(x) for x in spec.split(",")]
+    speeds = list(spec)[:n]
+    return speeds + [speeds[-1]] * (n - len(speeds))
+
+def reserve_ports(n, base_port=BASE_PORT):
+    """
+        Binds and listens on n free loopback ports from base_port upwards,
+        skipping any in use. Returns the listening sockets.
+    """
+    sockets = []
+    for port in range(base_port, EPHEMERAL_PORT):
+        if len(sockets) == n:
+            break
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(('127.0.0.1', port))
+        except OSError:
+            sock.close()
+            continue
+        # Every pooled peer connects at startup, so allow a deep backlog
+        sock.listen(128)
+        sockets.append(sock)
+    if len(sockets) < n:
+        for sock in sockets:
+            sock.close()
+        raise RuntimeError(f"Only {len(sockets)} of {n} ports free between {base_port} and {EPHEMERAL_PORT}")
+    return sockets
+
+def make_experiment(spec, ports):
+    """Builds the configs make_configs.sh would write for spec, one per port."""
+    n = spec['agents']
+    speeds = clock_speeds(spec.get('clock_speeds', 1), n, spec.get('seed', 0))
+    options = spec.get('options', {})
+    # Keep the default send rate per neighbor when agents only talk to their neighbors
+    degree = n - 1 if options.get('topology', 'full') in ("full", "gossip") else options.get('degree', 4)
+    randn_UB = spec.get('randn_UB', 2 * (degree + 1))
+    configs = []
+    for i, port in enumerate(ports):
+        config = {
+            "experiment_dir": spec['name'],
+            "name": f"c{i + 1}",
+            "port": port,
+            "other_ports": ports[:i] + ports[i + 1:],
+            "randn_UB": randn_UB,
+            "clock_speed": speeds[i],
+        }
+        config.update(options)
+        configs.append(config)
+    return configs
+
+def write_configs(configs, config_dir):
+    """Saves configs as configs/[experiment]/c[i].yaml, for host.py and simulate.py."""
+    os.makedirs(config_dir, exist_ok=True)
+    for config in configs:
+        with open(os.path.join(config_dir, f"{config['name']}.yaml"), 'w') as f:
+            yaml.safe_dump(config, f, default_flow_style=None, sort_keys=False)
+
+# Agent process: keeps only its own socket and runs until time_limit after the shared start
+def run_agent_process(engine, config, time_limit, sockets, index, ready, go, start_at):
+    for i, sock in enumerate(sockets):
+        if i != index:
+            sock.close()
+
+    def start():
+        ready.release()
+        go.wait()
+        sleep_until(start_at.value)
+        return start_at.value
+
+    if engine == "asyncio":
+        run_async(config, time_limit, start, sockets[index])
+    else:
+        run_threaded(config, time_limit, start, sockets[index])
+
+def teardown(processes, timeout=5.0):
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    deadline = time.time() + timeout
+    for process in processes:
+        process.join(max(0.0, deadline - time.time()))
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+def supervise(processes, deadline):
+    """
+        Waits for every process to exit. If one fails, or any is still
+        running at deadline, the rest are torn down. Returns True if all
+        exited cleanly.
+    """
+    running = {process.sentinel: process for process in processes}
+    while running:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            print(f"[ERROR] {len(running)} processes still running at the deadline, stopping them")
+            teardown(processes)
+            return False
+        for sentinel in wait(list(running), remaining):
+            process = running.pop(sentinel)
+            process.join()
+            if process.exitcode != 0:
+                print(f"[ERROR] {process.name} exited with code {process.exitcode}, stopping the experiment")
+                teardown(processes)
+                return False
+    return True
+
+def launch(spec, time_limit, engine="threaded", shards=1, base_port=BASE_PORT, quiet=True,
+           startup_timeout=30.0, grace=10.0, config_dir=None):
+    """
+        Runs one experiment for time_limit seconds. Returns True if every
+        agent started and exited cleanly.
+    """
+    raise_fd_limit()
+    if engine == "host":
+        # Hosted agents don't listen, so their ports only need to be distinct
+        configs = make_experiment(spec, list(range(base_port, base_port + spec['agents'])))
+    else:
+        sockets = reserve_ports(spec['agents'], base_port)
+        configs = make_experiment(spec, [sock.getsockname()[1] for sock in sockets])
+    for config in configs:
+        config['quiet'] = quiet
+    if config_dir is not None:
+        write_configs(configs, config_dir)
+
+    print(f"[INFO] Experiment {spec['name']}: {len(configs)} agents, engine {engine}")
+    if engine == "host":
+        return run_host(configs, time_limit, shards)
+
+    ctx = multiprocessing.get_context("fork")
+    ready, go, start_at = ctx.Semaphore(0), ctx.Event(), ctx.Value('d', 0.0)
+    processes = [ctx.Process(target=run_agent_process, name=config['name'],
+                             args=(engine, config, time_limit, sockets, i, ready, go, start_at))
+                 for i, config in enumerate(configs)]
+    try:
+        for process in processes:
+            process.start()
+        # The agents own their sockets now
+        for sock in sockets:
+            sock.close()
+
+        # Wait for every agent to be listening, as long as none has died
+        deadline = time.time() + startup_timeout
+        started = 0
+        while started < len(processes):
+            if ready.acquire(timeout=0.1):
+                started += 1
+            elif time.time() > deadline or any(p.exitcode is not None for p in processes):
+                print(f"[ERROR] Only {started} of {len(processes)} agents started")
+                teardown(processes)
+                return False
+
+        # Leave the agents a moment to wake up before the first tick
+        start_at.value = time.time() + 0.1
+        go.set()
+        return supervise(processes, start_at.value + time_limit + grace)
+    except KeyboardInterrupt:
+        teardown(processes)
+        raise
+
+def expand_specs(doc):
+    """
+        Reads an experiment file: "experiments" lists specs, and "matrix" maps
+        spec keys to lists of values whose every combination becomes a spec.
+        Both are merged over "defaults".
+    """
+    defaults = doc.get('defaults', {})
+    specs = [{**defaults, **spec} for spec in doc.get('experiments', [])]
+    matrix = doc.get('matrix', {})
+    keys = list(matrix)
+    for values in itertools.product(*(matrix[key] for key in keys)):
+        spec = {**defaults, **dict(zip(keys, values))}
+        suffix = "_".join(f"{key}{value}" for key, value in zip(keys, values))
+        spec['name'] = "".join(c if c.isalnum() or c in "_-" else "-" for c in f"{defaults.get('name', 'matrix')}_{suffix}")
+        specs.append(spec)
+    return specs
+
+# Matrix child: one experiment, with its ports and output kept apart from the others
+def run_experiment(spec, time_limit, engine, shards, base_port):
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        ok = launch(spec, time_limit, engine, shards, base_port)
+    sys.exit(0 if ok else 1)
+
+def run_matrix(specs, time_limit, cores, engine="host", shards=1, base_port=BASE_PORT):
+    """
+        Runs specs concurrently, starting the next one whenever enough of the
+        core budget is free. Returns the names of experiments that failed.
+    """
+    ctx = multiprocessing.get_context("fork")
+    running = {}
+    used = 0
+    failed = []
+    costs = [min(cores, shards if engine == "host" else spec['agents']) for spec in specs]
+    # Each concurrent experiment gets its own port range, the lowest one free
+    stride = max(spec['agents'] for spec in specs)
+    concurrent = min(len(specs), max(1, cores // min(costs)))
+    if engine != "host" and base_port + concurrent * stride > EPHEMERAL_PORT:
+        raise ValueError(f"{concurrent} concurrent experiments of up to {stride} agents need ports "
+                         f"{base_port}-{base_port + concurrent * stride - 1}, past {EPHEMERAL_PORT - 1}")
+    slots = list(range(concurrent))
+    pending = list(zip(specs, costs))
+    while pending or running:
+        while pending:
+            spec, cost = pending[0]
+            if running and used + cost > cores:
+                break
+            pending.pop(0)
+            slot = heapq.heappop(slots)
+            process = ctx.Process(target=run_experiment, name=spec['name'],
+                                  args=(spec, time_limit, engine, shards, base_port + slot * stride))
+            process.start()
+            running[process.sentinel] = (process, cost, slot)
+            used += cost
+            print(f"[INFO] Started {spec['name']} ({cost} cores, {used}/{cores} in use)")
+
+        for sentinel in wait(list(running)):
+            process, cost, slot = running.pop(sentinel)
+            process.join()
+            used -= cost
+            heapq.heappush(slots, slot)
+            if process.exitcode == 0:
+                print(f"[INFO] Finished {process.name}")
+            else:
+                failed.append(process.name)
+                print(f"[ERROR] {process.name} failed with code {process.exitcode}")
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate, run and supervise experiments.")
+    # -e or --experiment : experiment name, used under logs/ (and configs/ with -w)
+    parser.add_argument("-e", "--experiment", type=str, help="Experiment name.")
+    # -n or --agents : number of agents
+    parser.add_argument("-n", "--agents", type=int, default=3, help="Number of agents.")
+    # -c or --clock-speeds : "1,1,2" (last one repeated), "uniform:1:3" or "choice:1,3,6"
+    parser.add_argument("-c", "--clock-speeds", type=str, default="1", help="Clock speeds.")
+    # -u or --randn-ub : upper bound of the event roll, default twice the agent count
+    parser.add_argument("-u", "--randn-ub", type=int, default=None, help="randn_UB for every agent.")
+    # -o or --option : extra config key for every agent, e.g. -o connection_pool=true
+    parser.add_argument("-o", "--option", action="append", default=[], help="Extra config key=value.")
+    # -f or --file : YAML file of experiments and/or a matrix, run concurrently
+    parser.add_argument("-f", "--file", type=str, default=None, help="Experiment file.")
+    # -t or --time : time (seconds) to run each experiment
+    parser.add_argument("-t", "--time", type=int, default=120, help="Time to run in seconds.")
+    # -E or --engine : one process per agent (threaded, asyncio) or host.py shards
+    parser.add_argument("-E", "--engine", type=str, default="threaded", choices=ENGINES, help="Execution engine.")
+    # -s or --shards : host engine worker processes per experiment
+    parser.add_argument("-s", "--shards", type=int, default=1, help="Shards per experiment.")
+    # -j or --cores : core budget for concurrent experiments
+    parser.add_argument("-j", "--cores", type=int, default=os.cpu_count(), help="Core budget.")
+    # -p or --port : first port to reserve
+    parser.add_argument("-p", "--port", type=int, default=BASE_PORT, help="First agent port.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for random clock speeds.")
+    # -w or --write-configs : also save the generated configs under configs/
+    parser.add_argument("-w", "--write-configs", action="store_true", help="Save configs under configs/.")
+    # -v or --verbose : print every agent's ticks
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print every tick.")
+    args = parser.parse_args()
+
+    if args.file is not None:
+        with open(args.file) as f:
+            specs = expand_specs(yaml.safe_load(f))
+        try:
+            failed = run_matrix(specs, args.time, args.cores, args.engine, args.shards, args.port)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            exit(1)
+        print(f"[INFO] {len(specs) - len(failed)} of {len(specs)} experiments finished")
+        sys.exit(1 if failed else 0)
+
+    if args.experiment is None:
+        print("[ERROR] No experiment name or file provided.")
+        exit(1)
+    spec = {"name": args.experiment, "agents": args.agents, "clock_speeds": args.clock_speeds,
+            "seed": args.seed, "options": {}}
+    if args.randn_ub is not None:
+        spec['randn_UB'] = args.randn_ub
+    for option in args.option:
+        key, _, value = option.partition("=")
+        spec['options'][key] = yaml.safe_load(value)
+
+    config_dir = f"configs/{args.experiment}/" if args.write_configs else None
+    start = time.time()
+    ok = launch(spec, args.time, args.engine, args.shards, args.port, not args.verbose, config_dir=config_dir)
+    print(f"[INFO] Experiment {args.experiment} {'finished' if ok else 'failed'} in {time.time() - start:.1f}s")
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,18 @@
-import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 import numpy as np
 import matplotlib.ticker as ticker
 from matplotlib.animation import PillowWriter
 import argparse
 import colorsys
+import glob
 import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from analysis import find_logs, load_log, window_bounds
 
 def create_distinguishable_colors(n):
     # Generate a list of n distinguishable colors
@@ -20,146 +26,206 @@ def create_distinguishable_colors(n):
     )
     return colors
 
-# Read experiment name from the command line
-parser = argparse.ArgumentParser(description="Make animations for the experiment.")
-parser.add_argument("-e", "--experiment", type=str, help="Experiment name.")
-parser.add_argument("-s", "--subtitle", type=str, help="Subtitle data.")
-args = parser.parse_args()
-
-if args.experiment is None:
-    # Raise an error if no experiment name is provided
-    print("[ERROR] No experiment name provided.")
-    exit(1)
-
-experiment_name = args.experiment
-base_dir = f"logs/{experiment_name}/"
-
-subdirs = os.listdir(base_dir)
-
-# If it is not a directory, remove it from the list
-subdirs = [dir_now for dir_now in subdirs if os.path.isdir(f"{base_dir}{dir_now}")]
-
-csv_paths = [f"{base_dir}{dir_now}/events.csv" for dir_now in subdirs]
-
-# Sort them alpanumerically
-csv_paths.sort()
-
-subtitle_data = args.subtitle
-
-xs_to_graph = ['TimeGlob', 'TimeGlob', 'TimeGlob']
-ys_to_graph = ['QueueLen', 'TimeLocal', 'JumpTime']
-
-window = 20  # sliding window size
-
-# Read the data from the CSV file logs/test/c1_log/events.csv
-dfs = []
-
-for path in csv_paths:
-    df = pd.read_csv(path)
-    diffs = df['TimeLocal'].diff().fillna(0)
-    df['JumpTime'] = diffs.expanding().mean()
-    dfs.append(df)
-
-for x, y in zip(xs_to_graph, ys_to_graph):
-    start_times = []
-    max_time_globs = []
-    n_points = []
-    queue_len_mins = []
-    queue_len_maxs = []
-
-    for df in dfs:
-        start_times.append(df[x].min())
-        max_time_globs.append(df[x].max())
-        queue_len_maxs.append(df[y].max())
-        queue_len_mins.append(df[y].min())
-        n_points.append(df.shape[0])
-
-    # Normalize the time values
-    for i in range(len(dfs)):
-        dfs[i][x] = dfs[i][x] - min(start_times)
-
-    T = max(max_time_globs) - min(start_times)  # Total time
-
-    # Create the figure and axes
-    fig, ax = plt.subplots()
-
-    # Initialize line objects for each dataset
+def agent_colors(n):
     colors = ['b', 'r', 'g', 'y', 'm', 'c', 'k', 'orange', 'purple', 'brown', 'pink', 'gray']
+    if n > len(colors):
+        colors = create_distinguishable_colors(n)
+    return colors
 
-    lines = []
-    if len(dfs) > len(colors):
-        colors = create_distinguishable_colors(len(dfs))
-
-
-
-    for i in range(len(dfs)):
-        # line, = ax.plot([], [], f'{colors[i]}-', label=f'Config {i+1}')
-        line, = ax.plot([], [], color=colors[i], linestyle="solid", label=f'Config {i+1}')
-        lines.append(line)
-
-    # Set plot limits (adjust these based on your data)
-    ax.set_xlim(0, T)
-    ymin = min(queue_len_mins)
-    ymax = max(queue_len_maxs)
-    ax.set_ylim(ymin, ymax)
-    # ax.legend()
-    ax.xaxis.set_major_locator(ticker.MaxNLocator(integer=True))
-
-    # Name axes
-    ax.set_xlabel(x)
-    ax.set_ylabel(y)
-
-    fig.subplots_adjust(top=0.84)  # adjust as needed for your title/subtitle spacing
-
-    # Set the centered main title and subtitle using the figure's methods.
-    fig.suptitle(f"{x} vs {y}", fontsize=16, fontweight='bold', y=0.95)
-    fig.text(0.5, 0.85, subtitle_data, ha='center', fontsize=12)
-
-    # Determine the maximum number of frames based on each dataset
-    max_frames = int(T)
-
-    def init():
-        for line in lines:
-            line.set_data([], [])
-        return lines
-
-    def update(frame):
+"""
+    One metric plotted for every agent. Each log is already sorted by
+    TimeGlob, so the sliding window of every frame is a pair of
+    searchsorted indices: drawing a frame costs only the rows inside it.
+"""
+class MetricPlot:
+    def __init__(self, logs, x, y, subtitle_data, colors, window=20):
+        self.window = window
+        start_time = min(log[x][0] for log in logs if len(log[x]))
+        end_time = max(log[x][-1] for log in logs if len(log[x]))
+
+        # Normalize the time values
+        self.xs = [log[x] - start_time for log in logs]
+        self.ys = [log[y] for log in logs]
+
+        T = end_time - start_time  # Total time
+
+        # Create the figure and axes
+        self.fig, self.ax = plt.subplots()
+        fig, ax = self.fig, self.ax
+
+        # Initialize line objects for each dataset
+        self.lines = []
+        for i in range(len(logs)):
+            line, = ax.plot([], [], color=colors[i], linestyle="solid", label=f'Config {i+1}')
+            self.lines.append(line)
+
+        # Set plot limits (adjust these based on your data)
+        ax.set_xlim(0, T)
+        ymin = min(ys_now.min() for ys_now in self.ys if len(ys_now))
+        ymax = max(ys_now.max() for ys_now in self.ys if len(ys_now))
+        ax.set_ylim(ymin, ymax)
+        ax.xaxis.set_major_locator(ticker.MaxNLocator(integer=True))
+
+        # Name axes
+        ax.set_xlabel(x)
+        ax.set_ylabel(y)
+
+        fig.subplots_adjust(top=0.84)  # adjust as needed for your title/subtitle spacing
+
+        # Set the centered main title and subtitle using the figure's methods.
+        fig.suptitle(f"{x} vs {y}", fontsize=16, fontweight='bold', y=0.95)
+        fig.text(0.5, 0.85, subtitle_data, ha='center', fontsize=12)
+
+        # One frame per second of the experiment, and at least one for runs under a second
+        self.frames = range(0, frame_count(T))
+
+        # Window [lo, hi) of every frame, per agent
+        self.bounds = [window_bounds(xs_now, self.frames, window) for xs_now in self.xs]
+
+    def draw(self, f):
+        frame = self.frames[f]
+        window = self.window
         # Update x-axis limits: if frame < window, use [0, frame]; else use [frame-window, frame]
         if frame < window:
-            ax.set_xlim(0, frame)
+            self.ax.set_xlim(0, frame)
         else:
-            ax.set_xlim(frame - window, frame)
-
-        # For each dataframe, filter the data within the current x-axis window
-        for i, df in enumerate(dfs):
-            if frame < window:
-                # Select points from 0 to frame
-                mask = df[x] <= frame
-            else:
-                # Select points within [frame-window, frame]
-                mask = (df[x] > frame - window) & (df[x] <= frame)
-
-            lines[i].set_data(df[x][mask], df[y][mask])
-
-        # Gather y data from all lines that have non-empty data
-        all_y = np.concatenate([line.get_ydata() for line in lines if len(line.get_ydata()) > 0])
-        if len(all_y) > 0:
-            y_min, y_max = np.min(all_y), np.max(all_y)
+            self.ax.set_xlim(frame - window, frame)
+
+        y_min, y_max = np.inf, -np.inf
+        for i, (lo, hi) in enumerate(self.bounds):
+            ys_now = self.ys[i][lo[f]:hi[f]]
+            self.lines[i].set_data(self.xs[i][lo[f]:hi[f]], ys_now)
+            if len(ys_now):
+                y_min = min(y_min, ys_now.min())
+                y_max = max(y_max, ys_now.max())
+
+        if y_min <= y_max:
             # Optionally, add a margin so the points don't touch the border
             margin = (y_max - y_min) * 0.1 if y_max != y_min else 1
-            ax.set_ylim(y_min - margin, y_max + margin)
-
-        return lines
+            self.ax.set_ylim(y_min - margin, y_max + margin)
 
+    def close(self):
+        plt.close(self.fig)
 
+def frame_count(duration):
+    return max(1, int(duration))
 
-    anim = FuncAnimation(
-        fig, update, frames=range(0, max_frames),
-        init_func=init, blit=False, interval=200
-    )
+# Renders one metric as a GIF, streaming frames straight to the writer
+def render_metric(logs, x, y, subtitle_data, out_path, colors, window=20, fps=8):
+    plot = MetricPlot(logs, x, y, subtitle_data, colors, window)
 
     # Create a PillowWriter with desired frames per second (fps)
-    writer = PillowWriter(fps=8)  # adjust fps as needed
-
-    # Save the animation as a GIF
-    anim.save(f"{base_dir}{x}_vs_{y}.gif", writer=writer)
+    writer = PillowWriter(fps=fps)
+
+    with writer.saving(plot.fig, out_path, dpi=plot.fig.dpi):
+        for f in range(len(plot.frames)):
+            plot.draw(f)
+            writer.grab_frame()
+
+    plot.close()
+
+# Logs loaded by this worker process, keyed by experiment directory
+worker_logs = {}
+
+# Process pool task: renders frames [first, last) of one metric to PNG files
+def render_chunk(base_dir, x, y, subtitle_data, colors, window, first, last, frame_dir):
+    if base_dir not in worker_logs:
+        worker_logs[base_dir] = [load_log(log_dir) for log_dir in find_logs(base_dir)]
+    plot = MetricPlot(worker_logs[base_dir], x, y, subtitle_data, colors, window)
+    for f in range(first, min(last, len(plot.frames))):
+        plot.draw(f)
+        plot.fig.savefig(os.path.join(frame_dir, f"frame_{f:05d}.png"), dpi=plot.fig.dpi)
+    plot.close()
+
+def stitch(frame_dir, out_path, fmt, fps):
+    frame_paths = sorted(glob.glob(os.path.join(frame_dir, "frame_*.png")))
+    if not frame_paths:
+        print(f"[ERROR] No frames were rendered to {frame_dir}")
+        return
+    if fmt == "gif":
+        # Same encoding PillowWriter uses
+        images = [Image.open(path).convert("RGBA") for path in frame_paths]
+        images[0].save(out_path, save_all=True, append_images=images[1:], duration=int(1000 / fps), loop=0)
+        shutil.rmtree(frame_dir)
+    elif fmt == "mp4":
+        subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-framerate", str(fps),
+                        "-i", os.path.join(frame_dir, "frame_%05d.png"),
+                        "-pix_fmt", "yuv420p", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", out_path], check=True)
+        shutil.rmtree(frame_dir)
+    # "png" keeps the frame directory as the output
+
+"""
+    Renders every metric on a process pool: each metric's frames are split
+    into chunks of chunk_size, rendered to PNG by the workers and stitched
+    into a GIF or MP4 (or kept as a PNG sequence) once all chunks are done.
+"""
+def render_parallel(base_dir, metrics, subtitle_data, colors, jobs, fmt="gif", chunk_size=None, window=20, fps=8):
+    if fmt == "mp4" and shutil.which("ffmpeg") is None:
+        print("[ERROR] MP4 output needs ffmpeg on the PATH.")
+        exit(1)
+
+    # Frame counts are the same for every metric, since they share TimeGlob
+    logs = [load_log(log_dir) for log_dir in find_logs(base_dir)]
+    start_time = min(log['TimeGlob'][0] for log in logs if len(log['TimeGlob']))
+    end_time = max(log['TimeGlob'][-1] for log in logs if len(log['TimeGlob']))
+    n_frames = frame_count(end_time - start_time)
+    if chunk_size is None:
+        chunk_size = max(1, -(-n_frames * len(metrics) // jobs))
+
+    outputs = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = []
+        for x, y in metrics:
+            frame_dir = f"{base_dir}{x}_vs_{y}_frames"
+            if os.path.exists(frame_dir):
+                shutil.rmtree(frame_dir)
+            os.makedirs(frame_dir)
+            outputs.append((frame_dir, f"{base_dir}{x}_vs_{y}.{fmt}"))
+            for first in range(0, n_frames, chunk_size):
+                futures.append(pool.submit(render_chunk, base_dir, x, y, subtitle_data, colors, window,
+                                           first, first + chunk_size, frame_dir))
+        for future in futures:
+            future.result()
+
+    for frame_dir, out_path in outputs:
+        stitch(frame_dir, out_path, fmt, fps)
+
+def main():
+    # Read experiment name from the command line
+    parser = argparse.ArgumentParser(description="Make animations for the experiment.")
+    parser.add_argument("-e", "--experiment", type=str, help="Experiment name.")
+    parser.add_argument("-s", "--subtitle", type=str, help="Subtitle data.")
+    # -j or --jobs : render on a pool of this many processes
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of rendering processes.")
+    # -f or --format : gif, mp4 (needs ffmpeg) or png (a directory of frames per metric)
+    parser.add_argument("-f", "--format", type=str, default="gif", choices=["gif", "mp4", "png"],
+                        help="Output format.")
+    parser.add_argument("--chunk", type=int, help="Frames per rendering task.")
+    args = parser.parse_args()
+
+    if args.experiment is None:
+        # Raise an error if no experiment name is provided
+        print("[ERROR] No experiment name provided.")
+        exit(1)
+
+    experiment_name = args.experiment
+    base_dir = f"logs/{experiment_name}/"
+
+    xs_to_graph = ['TimeGlob', 'TimeGlob', 'TimeGlob']
+    ys_to_graph = ['QueueLen', 'TimeLocal', 'JumpTime']
+    metrics = list(zip(xs_to_graph, ys_to_graph))
+
+    colors = agent_colors(len(find_logs(base_dir)))
+
+    if args.jobs > 1 or args.format != "gif":
+        render_parallel(base_dir, metrics, args.subtitle, colors, args.jobs, args.format, args.chunk)
+        return
+
+    # One log per agent, sorted alphanumerically
+    logs = [load_log(log_dir) for log_dir in find_logs(base_dir)]
+
+    for x, y in metrics:
+        render_metric(logs, x, y, args.subtitle, f"{base_dir}{x}_vs_{y}.gif", colors)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+"""
+    Live runtime metrics. An agent created with metrics=True keeps counters
+    and log2-bucketed histograms of tick lateness, send latency (overall and
+    per peer) and queue depth, updated in place on the tick path. A
+    MetricsServer serves snapshots as JSON over HTTP on localhost, and
+    `python metrics.py` fetches and aggregates them across agents.
+"""
+
+"""
+    Histogram of non-negative integers (microseconds, queue lengths) in
+    power-of-two buckets: bucket 0 holds 0 and bucket b holds
+    [2^(b-1), 2^b). Recording is a bit_length and an increment.
+"""
+class Histogram:
+    BUCKETS = 64
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        value = int(value) if value > 0 else 0
+        self.counts[min(value.bit_length(), self.BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for b, n in enumerate(other.counts):
+            self.counts[b] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (0 <= q <= 100)."""
+        if self.count == 0:
+            return 0
+        target = q / 100 * self.count
+        seen = 0
+        for b, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= target:
+                return min((1 << b) - 1, self.max)
+        return self.max
+
+    def to_dict(self):
+        # Trailing empty buckets are left out to keep snapshots small
+        last = max((b for b, n in enumerate(self.counts) if n), default=-1)
+        return {"count": self.count, "total": self.total, "max": self.max,
+                "mean": self.total / self.count if self.count else 0,
+                "p50": self.percentile(50), "p99": self.percentile(99), "buckets": self.counts[:last + 1]}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        for b, n in enumerate(data["buckets"]):
+            histogram.counts[b] = n
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.max = data["max"]
+        return histogram
+
+class AgentMetrics:
+    def __init__(self):
+        self.started = time.time()
+        self.ticks = 0
+        self.messages_in = 0
+        self.messages_out = 0
+        self.tick_lateness = Histogram()
+        self.queue_depth = Histogram()
+        self.send_latency = Histogram()
+        self.send_latency_by_peer = {}
+
+    # Called once per tick with its lateness (seconds) and the queue length
+    def tick(self, lateness, queue_len):
+        self.ticks += 1
+        self.tick_lateness.record(lateness * 1e6)
+        self.queue_depth.record(queue_len)
+
+    # Called per write to a peer; messages > 1 when coalesced sends share it
+    def sent(self, port, elapsed, messages=1):
+        self.messages_out += messages
+        us = elapsed * 1e6
+        self.send_latency.record(us)
+        histogram = self.send_latency_by_peer.get(port)
+        if histogram is None:
+            histogram = self.send_latency_by_peer[port] = Histogram()
+        histogram.record(us)
+
+    def received(self):
+        self.messages_in += 1
+
+    def snapshot(self):
+        return {
+            "uptime": time.time() - self.started,
+            "counters": {"ticks": self.ticks, "messages_in": self.messages_in, "messages_out": self.messages_out},
+            "histograms": {"tick_lateness_us": self.tick_lateness.to_dict(),
+                           "queue_depth": self.queue_depth.to_dict(),
+                           "send_latency_us": self.send_latency.to_dict()},
+            # Copied first: the tick thread may add a peer while the endpoint thread reads
+            "send_latency_us_by_peer": {str(port): h.to_dict() for port, h in list(self.send_latency_by_peer.items())},
+        }
+
+def aggregate(snapshots):
+    """Sums the counters and merges the histograms of several agent snapshots."""
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, value in snapshot["counters"].items():
+            counters[name] = counters.get(name, 0) + value
+        for name, data in snapshot["histograms"].items():
+            histograms.setdefault(name, Histogram()).merge(Histogram.from_dict(data))
+    return {"agents": len(snapshots), "counters": counters,
+            "histograms": {name: h.to_dict() for name, h in histograms.items()}}
+
+"""
+    Serves collect() as JSON on 127.0.0.1:port from a daemon thread:
+    GET /metrics returns {"agents": [...], "total": aggregate}, where
+    collect returns the list of agent snapshots.
+"""
+class MetricsServer:
+    def __init__(self, port, collect):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                snapshots = collect()
+                body = json.dumps({"agents": snapshots, "total": aggregate(snapshots)}).encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            # Keep request lines out of the agent's stdout
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"[INFO] Metrics served on http://127.0.0.1:{port}/metrics")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def fetch(port, timeout=2.0):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=timeout) as response:
+        return json.load(response)
+
+def parse_ports(specs):
+    """Expands "9100", "9100-9105" and comma-separated lists of them."""
+    ports = []
+    for spec in ",".join(specs).split(","):
+        lo, _, hi = spec.partition("-")
+        ports.extend(range(int(lo), int(hi or lo) + 1))
+    return ports
+
+def report(ports):
+    snapshots = []
+    for port in ports:
+        try:
+            snapshots.extend(fetch(port)["agents"])
+        except OSError as e:
+            print(f"[ERROR] Could not fetch metrics from port {port}: {e}")
+    print("Agent,Ticks,MsgsIn,MsgsOut,LatenessP50us,LatenessP99us,QueueP99,QueueMax,SendP99us,LogBytes")
+    for snapshot in snapshots:
+        c, h = snapshot["counters"], snapshot["histograms"]
+        print(f"{snapshot.get('name', '')},{c['ticks']},{c['messages_in']},{c['messages_out']},"
+              f"{h['tick_lateness_us']['p50']},{h['tick_lateness_us']['p99']},{h['queue_depth']['p99']},"
+              f"{h['queue_depth']['max']},{h['send_latency_us']['p99']},{c.get('log_bytes', '')}")
+    total = aggregate(snapshots)
+    c, h = total["counters"], total["histograms"]
+    if snapshots:
+        print(f"[INFO] {total['agents']} agents: {c['ticks']} ticks, {c['messages_in']} in, {c['messages_out']} out, "
+              f"lateness p99 {h['tick_lateness_us']['p99']}us, send p99 {h['send_latency_us']['p99']}us, "
+              f"queue max {h['queue_depth']['max']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch and aggregate live agent metrics.")
+    # positional : metrics ports, e.g. 9100 9101 or 9100-9159
+    parser.add_argument("ports", nargs="+", help="Metrics ports or port ranges.")
+    # -w or --watch : refresh every this many seconds until interrupted
+    parser.add_argument("-w", "--watch", type=float, default=None, help="Refresh interval in seconds.")
+    args = parser.parse_args()
+
+    ports = parse_ports(args.ports)
+    while True:
+        report(ports)
+        if args.watch is None:
+            break
+        sys.stdout.flush()
+        time.sleep(args.watch)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+import threading
+from collections import deque
+
+"""
+    Policies for ClientProcess.network_queue. Every queue offers the deque
+    methods the client uses (append, extend, popleft, len and iteration)
+    and counts its high-water mark, dropped and coalesced messages.
+        "fifo": unbounded FIFO, the original behavior
+        "bounded": FIFO of at most limit messages. extend(..., block=True),
+            which the threaded runner's listener uses, waits for room, so the
+            listener stops reading its sockets and TCP pushes back on the
+            senders. Callers that must not block (in-memory delivery, the
+            asyncio engine) drop the oldest message instead.
+        "coalesce": at most one message per sender, the one with the
+            highest tick. A newer message from a sender already queued
+            replaces it in place, so the queue never outgrows the peer count.
+"""
+
+class FifoQueue:
+    def __init__(self):
+        self.items = deque()
+        self.high_water = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def append(self, message):
+        self.items.append(message)
+        if len(self.items) > self.high_water:
+            self.high_water = len(self.items)
+
+    def extend(self, messages, block=False):
+        self.items.extend(messages)
+        if len(self.items) > self.high_water:
+            self.high_water = len(self.items)
+
+    def popleft(self):
+        return self.items.popleft()
+
+    # Wakes anything waiting on the queue; called when the client closes
+    def close(self):
+        pass
+
+class BoundedQueue(FifoQueue):
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+        self.closed = False
+        self.not_full = threading.Condition()
+
+    def append(self, message):
+        self.extend((message,))
+
+    def extend(self, messages, block=False):
+        with self.not_full:
+            for message in messages:
+                while block and len(self.items) >= self.limit and not self.closed:
+                    self.not_full.wait()
+                if len(self.items) >= self.limit:
+                    # Drop the stalest tick rather than the newest
+                    self.items.popleft()
+                    self.dropped += 1
+                self.items.append(message)
+            if len(self.items) > self.high_water:
+                self.high_water = len(self.items)
+
+    def popleft(self):
+        with self.not_full:
+            message = self.items.popleft()
+            self.not_full.notify()
+        return message
+
+    def close(self):
+        with self.not_full:
+            self.closed = True
+            self.not_full.notify_all()
+
+class CoalescingQueue(FifoQueue):
+    def __init__(self):
+        super().__init__()
+        # Sender port -> its highest-tick pending message, in arrival order
+        self.items = {}
+        self.lock = threading.Lock()
+
+    def __iter__(self):
+        return iter(list(self.items.values()))
+
+    def append(self, message):
+        self.extend((message,))
+
+    def extend(self, messages, block=False):
+        with self.lock:
+            items = self.items
+            for message in messages:
+                port = message["port"]
+                current = items.get(port)
+                if current is None:
+                    items[port] = message
+                    continue
+                self.coalesced += 1
+                if message["tick"] > current["tick"]:
+                    items[port] = message
+            if len(items) > self.high_water:
+                self.high_water = len(items)
+
+    def popleft(self):
+        with self.lock:
+            if not self.items:
+                raise IndexError("pop from an empty queue")
+            return self.items.pop(next(iter(self.items)))
+
+def make_queue(policy="fifo", limit=1024):
+    if policy == "bounded":
+        return BoundedQueue(limit)
+    if policy == "coalesce":
+        return CoalescingQueue()
+    if policy == "fifo":
+        return FifoQueue()
+    raise ValueError(f"Unknown queue policy: {policy}")
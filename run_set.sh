@@ -1,11 +1,12 @@
 #!/bin/bash
 
 if [ -z "$1" ]; then
-    echo "Usage: $0 <experiment_name>"
+    echo "Usage: $0 <experiment_name> [threaded|asyncio]"
     exit 1
 fi
 
 experiment_name="$1"
+engine="${2:-threaded}"
 
 # List of config files
 # configs=("c1.yaml" "c2.yaml" "c3.yaml")
@@ -15,7 +16,7 @@ configs=($(ls $dir))
 # Loop through each config and run runner.py in the background
 for config in "${configs[@]}"; do
     echo "Starting runner.py with config $dir$config"
-    python runner.py -c "$dir$config" -t 120 &
+    python runner.py -c "$dir$config" -t 120 -e "$engine" &
 done
 
 # Wait for all background processes to complete
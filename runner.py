@@ -2,50 +2,72 @@ import time
 import argparse
 import yaml
 import threading
-from random import randint
+import random
 from client import ClientProcess
+from metrics import MetricsServer
+from topology import neighbors, broadcast_fanout
+from shm_transport import SHM_SLOTS
+
+# Applies the event rule for one clock tick: read a queued message if there is
+# one, otherwise roll for an internal event, a unicast or a broadcast.
+# rng is anything with randint and sample, e.g. a seeded random.Random.
+# other_ports are the agent's neighbors; with fanout, a broadcast reaches
+# that many of them, picked at random, instead of all of them.
+def run_event(communicator, other_ports, randn_UB, rng=random, fanout=None):
+    n_agents = len(other_ports)
 
-"""
-    Handles logic for communicating between clients.
-    This is the main entry point for the program.
-"""
-def main():
-    # Set up argument parsing for the configuration file.
-    parser = argparse.ArgumentParser(description="Runner for ProcessCommunicator.")
-    # -c or --config : .yaml file containing the configuration
-    parser.add_argument("-c", "--config", type=str, help="Path to the configuration file.")
-    # -t or --time : time (seconds) to run the simulation
-    parser.add_argument("-t", "--time", type=int, help="Time to run the simulation in seconds.")
-    args = parser.parse_args()
-
-    if args.config is None:
-        print("[ERROR] No configuration file provided.")
-
-    # Load the configuration file.
-    with open(args.config, 'r') as file:
-        config = yaml.safe_load(file)
-        print(f"[INFO] Configuration loaded: {config}")
-
-    port = config['port']
-    other_ports = config['other_ports']
-    clock_speed = config['clock_speed']
+    # Check if there is a message in the queue; read up to reads_per_tick of them
+    if len(communicator.network_queue) > 0:
+        for _ in range(min(communicator.reads_per_tick, len(communicator.network_queue))):
+            communicator.read_message()
+    else:
+        randn = rng.randint(1,randn_UB + 1)
+
+        if randn > n_agents + 1:
+            communicator.internal_event()
+        else:
+            # Send a message to all other ports
+            if randn <= n_agents:
+                send_ports = [other_ports[randn - 1]]
+            elif fanout is None or fanout >= n_agents:
+                send_ports = other_ports
+            else:
+                send_ports = rng.sample(other_ports, fanout)
+            tick = communicator.ticks
+            message = {"tick": tick, "port": communicator.port}
+            communicator.send_message(message, send_ports)
+
+# Runs one agent with a listener thread and a polling main loop. start, if
+# given, blocks until the other agents are ready and returns the shared start
+# time; server_socket is an already listening socket for the agent's port.
+def run_threaded(config, time_limit, start=None, server_socket=None):
+    other_ports = neighbors(config)
+    fanout = broadcast_fanout(config)
     name = config['name']
-    experiment_dir = config['experiment_dir']
     randn_UB = config['randn_UB']
-
-    n_agents = len(other_ports)
-
-    time_limit = args.time
+    pooled = config.get('connection_pool', False)
 
     # Create an instance bound to the local port.
-    communicator = ClientProcess(clock_speed, port, name, experiment_dir)
+    communicator = make_client(config, pooled=pooled, server_socket=server_socket)
+    quiet = config.get('quiet', False)
+
+    # Optional live metrics endpoint
+    metrics_server = None
+    if config.get('metrics_port'):
+        metrics_server = MetricsServer(config['metrics_port'], lambda: [communicator.metrics_snapshot()])
 
     # Separate thread to listen for incoming messages.
     def listen_for_messages():
         while True:
-            received = communicator.await_message()
+            if pooled:
+                # Framed connections deliver messages in batches
+                received = communicator.await_messages()
+            else:
+                message = communicator.await_message()
+                received = None if message is None else [message]
             if received is not None:
-                communicator.append_message(received)
+                # Blocks while a bounded queue is full, pushing back on the senders
+                communicator.append_messages(received, block=True)
                 # print(f"[INFO] Message received: {received}")
             else:
                 print("Socket closed. Exiting listener thread.")
@@ -55,17 +77,27 @@ def main():
     listener_thread.daemon = True
     listener_thread.start()
 
-    # Wait for a bit before starting the main loop
-    time.sleep(1)
-
-    start_time = time.time()
+    # Wait for a bit before starting the main loop, or for the launcher's start
+    if start is None:
+        time.sleep(1)
+        start_time = time.time()
+    else:
+        start_time = start()
+    communicator.start(start_time)
+    absolute = communicator.scheduler == "absolute"
 
     # Main loop
     while True:
+        # Sleep until the next tick is due instead of spinning
+        if absolute and not communicator.is_available:
+            sleep_until(communicator.next_deadline)
+
         # Get current time
         communicator.time = time.time()
         # If time_limit seconds have passed, break and close the communicator
         if communicator.time - start_time > time_limit:
+            if metrics_server is not None:
+                metrics_server.close()
             communicator.close()
             # Stop the listener thread
             listener_thread.join()
@@ -76,24 +108,95 @@ def main():
 
         # If ready for an event
         if communicator.is_available:
-            # Check if there is a message in the queue
-            if len(communicator.network_queue) > 0:
-                message = communicator.read_message()
-            else:
-                randn = randint(1,randn_UB + 1)
-
-                if randn > n_agents + 1:
-                    communicator.internal_event()
-                else:
-                    # Send a message to all other ports
-                    send_ports = other_ports if randn == n_agents + 1 else [other_ports[randn - 1]]
-                    tick = communicator.ticks
-                    message = {"tick": tick, "port": communicator.port}
-                    communicator.send_message(message, send_ports)
+            communicator.drain_shared()
+            run_event(communicator, other_ports, randn_UB, fanout=fanout)
+            communicator.flush_outbox()
 
             # After executing, return to unavailable
             communicator.set_unavailable()
-            print(f"Process {name} : Tick {communicator.ticks}")
+            if not quiet:
+                print(f"Process {name} : Tick {communicator.ticks}")
+
+# time.sleep can overshoot by a scheduler quantum, so sleep most of the way
+# and spin for the last millisecond.
+def sleep_until(deadline, spin=0.001):
+    remaining = deadline - time.time()
+    if remaining > spin:
+        time.sleep(remaining - spin)
+    while time.time() < deadline:
+        pass
+
+# Builds the agent described by a config; kwargs override ClientProcess options.
+def make_client(config, **kwargs):
+    options = {
+        "log_format": config.get('log_format', 'csv'),
+        "log_writer": config.get('log_writer', 'inline'),
+        "log_buffer": config.get('log_buffer', 65536),
+        "log_policy": config.get('log_policy', 'block'),
+        "scheduler": config.get('scheduler', 'relative'),
+        "wire": config.get('wire_format', 'json'),
+        "coalesce": config.get('coalesce', False),
+        "clock": config.get('clock', 'lamport'),
+        "peers": config['other_ports'],
+        "queue_policy": config.get('queue_policy', 'fifo'),
+        "queue_limit": config.get('queue_limit', 1024),
+        "reads_per_tick": config.get('reads_per_tick', 1),
+        "metrics": config.get('metrics', False) or bool(config.get('metrics_port')),
+        "transport": config.get('transport', 'tcp'),
+        "shm_slots": config.get('shm_slots', SHM_SLOTS),
+        # Lanes only for the agents that can send to us
+        "shm_peers": neighbors(config),
+    }
+    options.update(kwargs)
+    experiment_dir = options.pop('experiment_dir', None) or config['experiment_dir']
+    communicator = ClientProcess(config['clock_speed'], config['port'], config['name'], experiment_dir, **options)
+    communicator.write_metadata("Randn UB", config['randn_UB'])
+    communicator.write_metadata("Peers", len(config['other_ports']))
+    communicator.write_metadata("Topology", config.get('topology', 'full'))
+    return communicator
+
+def load_config(path):
+    with open(path, 'r') as file:
+        # The C loader matters once configs list hundreds of ports
+        config = yaml.load(file, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+        print(f"[INFO] Configuration loaded: {config}")
+    return config
+
+"""
+    Handles logic for communicating between clients.
+    This is the main entry point for the program.
+"""
+def main():
+    # Set up argument parsing for the configuration file.
+    parser = argparse.ArgumentParser(description="Runner for ProcessCommunicator.")
+    # -c or --config : .yaml file containing the configuration
+    parser.add_argument("-c", "--config", type=str, help="Path to the configuration file.")
+    # -t or --time : time (seconds) to run the simulation
+    parser.add_argument("-t", "--time", type=int, help="Time to run the simulation in seconds.")
+    # -e or --engine : threaded (listener thread + polling loop) or asyncio (event loop)
+    parser.add_argument("-e", "--engine", type=str, default="threaded", choices=["threaded", "asyncio"],
+                        help="Execution engine for the agent.")
+    # -q or --quiet : skip the per-tick print
+    parser.add_argument("-q", "--quiet", action="store_true", help="Don't print every tick.")
+    # -m or --metrics-port : serve live metrics on this localhost port
+    parser.add_argument("-m", "--metrics-port", type=int, default=None, help="Port for the metrics endpoint.")
+    args = parser.parse_args()
+
+    if args.config is None:
+        print("[ERROR] No configuration file provided.")
+
+    # Load the configuration file.
+    config = load_config(args.config)
+    if args.quiet:
+        config['quiet'] = True
+    if args.metrics_port is not None:
+        config['metrics_port'] = args.metrics_port
+
+    if args.engine == "asyncio":
+        from async_runner import run_async
+        run_async(config, args.time)
+    else:
+        run_threaded(config, args.time)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
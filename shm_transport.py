@@ -0,0 +1,188 @@
+import time
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+"""
+    Shared-memory transport for agents on the same host. Every agent owns
+    one segment, its inbox, with one lane per peer. A lane is a
+    single-producer, single-consumer ring of fixed-size (tick, port, check)
+    slots: the sender writes slots and then advances the lane's tail, the
+    receiver reads up to the tail and then advances the head. Each counter
+    has a single writer, so no locks or atomic read-modify-writes are
+    needed, which Python could not provide across processes anyway.
+
+    Python has no memory fences either, so the receiver cannot rely on
+    seeing a slot's words before the tail that publishes it: x86 keeps
+    stores in order, but ARM (e.g. Apple Silicon) may not. The check word
+    is the slot's position mixed with its tick and port, so a slot whose
+    words are not all visible yet fails the check, and the receiver stops
+    at it and picks it up on a later drain.
+
+    Senders attach to a peer's inbox lazily, on the first message for it.
+    A message goes over TCP instead when the peer has no inbox here (a
+    remote or TCP-only agent), when our lane in it is full, or when the
+    message carries more than a tick and a port (e.g. a clock stamp). The
+    receiver drains its inbox once per tick, before reading its queue.
+
+    Segment layout, all int64:
+        magic, lanes, slots
+        sender port of each lane
+        head of each lane (written by the receiver)
+        tail of each lane (written by the sender)
+        lanes x slots x (tick, port, check)
+"""
+
+SHM_MAGIC = 0x4C43534D
+HEADER = 3
+
+# Words per slot
+SLOT = 3
+
+# Wait this long before retrying to attach to a peer without an inbox
+ATTACH_RETRY = 1.0
+
+# Slots per lane unless configured with shm_slots
+SHM_SLOTS = 256
+
+# Check word of the slot at lane position pos; works elementwise on arrays too
+def slot_check(pos, tick, port):
+    return (pos + 1) ^ tick ^ (port << 32)
+
+# Inboxes created by this process. Attaching registers a segment with the
+# resource tracker, which would unlink it when we exit, so attachments are
+# unregistered again unless the segment is one of our own.
+created = set()
+
+def segment_name(port):
+    return f"lc_inbox_{port}"
+
+# Returns (sender ports, heads, tails, slots) views over a segment's buffer
+def lane_views(buf, lanes, slots):
+    words = np.ndarray((HEADER + 3 * lanes + SLOT * lanes * slots,), dtype=np.int64, buffer=buf)
+    ports = words[HEADER:HEADER + lanes]
+    heads = words[HEADER + lanes:HEADER + 2 * lanes]
+    tails = words[HEADER + 2 * lanes:HEADER + 3 * lanes]
+    data = words[HEADER + 3 * lanes:].reshape(lanes, slots, SLOT)
+    return ports, heads, tails, data
+
+# A peer's inbox as seen by one sender: our lane's tail and slots
+class Lane:
+    def __init__(self, segment, lane, lanes, slots):
+        self.segment = segment
+        _, self.heads, self.tails, self.data = lane_views(segment.buf, lanes, slots)
+        self.lane = lane
+        self.slots = slots
+
+    def put(self, tick, port):
+        tail = int(self.tails[self.lane])
+        if tail - int(self.heads[self.lane]) >= self.slots:
+            return False
+        slot = self.data[self.lane, tail % self.slots]
+        slot[0] = tick
+        slot[1] = port
+        slot[2] = slot_check(tail, tick, port)
+        # Publish only after the slot is written; the check word covers
+        # readers that see the stores out of order
+        self.tails[self.lane] = tail + 1
+        return True
+
+    def close(self):
+        self.heads = self.tails = self.data = None
+        self.segment.close()
+
+class SharedMemoryTransport:
+    def __init__(self, port, peers, slots=SHM_SLOTS):
+        self.port = port
+        self.slots = slots
+        self.sent = 0
+        self.fallbacks = 0
+
+        # Our inbox; a stale one left by a crashed run with our port is replaced
+        lanes = max(1, len(peers))
+        size = 8 * (HEADER + 3 * lanes + SLOT * lanes * slots)
+        try:
+            self.inbox = shared_memory.SharedMemory(segment_name(port), create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(segment_name(port))
+            stale.close()
+            stale.unlink()
+            self.inbox = shared_memory.SharedMemory(segment_name(port), create=True, size=size)
+        created.add(self.inbox._name)
+        self.header = np.ndarray((HEADER,), dtype=np.int64, buffer=self.inbox.buf)
+        ports, self.heads, self.tails, self.data = lane_views(self.inbox.buf, lanes, slots)
+        ports[:len(peers)] = sorted(peers)
+        self.heads[:] = 0
+        self.tails[:] = 0
+        # No position's check matches -1, so unwritten slots never look complete
+        self.data[:] = -1
+        self.header[1] = lanes
+        self.header[2] = slots
+        # Senders only use the inbox once the magic is set
+        self.header[0] = SHM_MAGIC
+
+        # Peer port -> our Lane in its inbox, or the time to retry attaching
+        self.lanes = {}
+        self.retry_at = {}
+
+    def attach(self, port):
+        """Our lane in port's inbox, or None if it has none we can use yet."""
+        lane = self.lanes.get(port)
+        if lane is not None:
+            return lane
+        if time.time() < self.retry_at.get(port, 0):
+            return None
+        try:
+            segment = shared_memory.SharedMemory(segment_name(port))
+        except FileNotFoundError:
+            self.retry_at[port] = time.time() + ATTACH_RETRY
+            return None
+        if segment._name not in created:
+            resource_tracker.unregister(segment._name, "shared_memory")
+        header = np.ndarray((HEADER,), dtype=np.int64, buffer=segment.buf)
+        ports = np.ndarray((int(header[1]),), dtype=np.int64, buffer=segment.buf, offset=8 * HEADER)
+        index = np.flatnonzero(ports == self.port)
+        if header[0] != SHM_MAGIC or len(index) == 0:
+            del header, ports
+            segment.close()
+            self.retry_at[port] = time.time() + ATTACH_RETRY
+            return None
+        lanes, slots = int(header[1]), int(header[2])
+        del header, ports
+        lane = self.lanes[port] = Lane(segment, int(index[0]), lanes, slots)
+        return lane
+
+    def send(self, port, message):
+        """Writes message into port's inbox; False if it must go over TCP instead."""
+        if len(message) == 2:
+            lane = self.attach(port)
+            if lane is not None and lane.put(message["tick"], message["port"]):
+                self.sent += 1
+                return True
+        self.fallbacks += 1
+        return False
+
+    def drain(self):
+        """Takes every complete message waiting in our inbox, lane by lane."""
+        heads, tails = self.heads, self.tails
+        messages = []
+        for lane in np.flatnonzero(tails != heads):
+            head, tail = int(heads[lane]), int(tails[lane])
+            positions = np.arange(head, tail)
+            records = self.data[lane, positions % self.slots]
+            # Stop at the first slot that isn't fully visible yet
+            incomplete = np.flatnonzero(records[:, 2] != slot_check(positions, records[:, 0], records[:, 1]))
+            if len(incomplete):
+                records = records[:incomplete[0]]
+            messages.extend({"tick": tick, "port": port} for tick, port, _ in records.tolist())
+            # Free the slots only after they have been read
+            heads[lane] = head + len(records)
+        return messages
+
+    def close(self):
+        for lane in self.lanes.values():
+            lane.close()
+        self.lanes.clear()
+        self.header = self.heads = self.tails = self.data = None
+        self.inbox.close()
+        self.inbox.unlink()
+        created.discard(self.inbox._name)
@@ -0,0 +1,125 @@
+import time
+import heapq
+import random
+import argparse
+from runner import run_event, make_client
+from host import load_experiment
+from topology import neighbors, broadcast_fanout
+
+"""
+    Deterministic discrete-event simulation of an experiment. Applies the
+    same per-tick event rule as runner.py, but on a simulated clock: ticks
+    and message deliveries are events in a priority queue, randomness comes
+    from seeded generators and the network adds a configurable delay. No
+    sockets are opened and no wall time passes, so a run is reproducible
+    from (configs, seed, delay) and writes the usual events.csv logs.
+"""
+
+# Event kinds, ordered so that at equal times deliveries land before ticks
+DELIVER = 0
+TICK = 1
+
+class Simulator:
+    """
+        delay: fixed network delay in simulated seconds
+        jitter: extra uniformly distributed delay in [0, jitter)
+        start_time: simulated TimeGlob of the first tick
+    """
+    def __init__(self, configs, seed=0, delay=0.0, jitter=0.0, start_time=0.0, experiment_dir=None):
+        self.configs = configs
+        self.delay = delay
+        self.jitter = jitter
+        self.start_time = start_time
+        self.now = start_time
+        self.events = []
+        self.seq = 0
+        self.network_rng = random.Random(f"{seed}:network")
+        # Jitter reorders messages, and vector deltas assume in-order delivery
+        if jitter > 0 and any(config.get('clock') == "vector" for config in configs):
+            raise ValueError("Vector clocks need in-order delivery, so they can't be simulated with jitter")
+
+        self.agents = {}
+        self.rngs = {}
+        self.neighbors = {}
+        self.fanouts = {}
+        for config in configs:
+            port = config['port']
+            communicator = make_client(config, listen=False, experiment_dir=experiment_dir)
+            communicator.sender = self.send
+            communicator.time = start_time
+            communicator.start(start_time)
+            self.agents[port] = communicator
+            # One generator per agent keeps its draws independent of event interleaving
+            self.rngs[port] = random.Random(f"{seed}:{config['name']}")
+            self.neighbors[port] = neighbors(config)
+            self.fanouts[port] = broadcast_fanout(config)
+
+    def schedule(self, at, kind, *payload):
+        heapq.heappush(self.events, (at, kind, self.seq, payload))
+        self.seq += 1
+
+    # Matches the ClientProcess.sender signature
+    def send(self, port, message):
+        if port not in self.agents:
+            print(f"[ERROR] Could not send message to port {port}: unknown agent")
+            return
+        delay = self.delay
+        if self.jitter > 0:
+            delay += self.network_rng.uniform(0, self.jitter)
+        self.schedule(self.now + delay, DELIVER, port, message)
+
+    def tick(self, config, k):
+        port = config['port']
+        communicator = self.agents[port]
+        communicator.time = self.now
+        if k > 0:
+            communicator.advance()
+        run_event(communicator, self.neighbors[port], config['randn_UB'], self.rngs[port], self.fanouts[port])
+        communicator.set_unavailable()
+
+    def run(self, time_limit):
+        for config in self.configs:
+            self.schedule(self.start_time, TICK, config, 0)
+
+        while self.events:
+            at, kind, _, payload = heapq.heappop(self.events)
+            # Same cut-off as the live runner: stop once time_limit has passed
+            if at - self.start_time > time_limit:
+                break
+            self.now = at
+            if kind == DELIVER:
+                port, message = payload
+                self.agents[port].append_message(message)
+            else:
+                config, k = payload
+                self.tick(config, k)
+                self.schedule(self.start_time + (k + 1) / config['clock_speed'], TICK, config, k + 1)
+
+        for communicator in self.agents.values():
+            communicator.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic discrete-event simulation of an experiment.")
+    # -e or --experiment : name of the directory under configs/
+    parser.add_argument("-e", "--experiment", type=str, help="Experiment name.")
+    # -t or --time : simulated time (seconds) to run
+    parser.add_argument("-t", "--time", type=float, default=120, help="Simulated seconds to run.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for all random draws.")
+    parser.add_argument("--delay", type=float, default=0.0, help="Network delay in simulated seconds.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra uniform network delay in simulated seconds.")
+    # -o or --output : log directory name under logs/ (defaults to the configs' experiment_dir)
+    parser.add_argument("-o", "--output", type=str, help="Experiment directory for the logs.")
+    args = parser.parse_args()
+
+    if args.experiment is None:
+        print("[ERROR] No experiment name provided.")
+        exit(1)
+
+    configs = load_experiment(f"configs/{args.experiment}/")
+    start = time.time()
+    sim = Simulator(configs, seed=args.seed, delay=args.delay, jitter=args.jitter, experiment_dir=args.output)
+    sim.run(args.time)
+    print(f"[INFO] Simulated {len(configs)} agents for {args.time}s in {time.time() - start:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import os
+import json
+import argparse
+import numpy as np
+from analysis import find_logs, load_log, event_log_path
+
+"""
+    Cached experiment summaries. Per-agent and cross-agent statistics are
+    computed once and stored in logs/<experiment>/summary.json, keyed by
+    each event log's mtime and size; later calls only reload the logs that
+    changed since.
+"""
+
+CACHE_NAME = "summary.json"
+CACHE_VERSION = 2
+
+def read_metadata(log_dir):
+    """Parses md.txt's "Key: value" lines, converting numeric values."""
+    metadata = {}
+    path = os.path.join(log_dir, "md.txt")
+    if not os.path.exists(path):
+        return metadata
+    with open(path) as md:
+        for line in md:
+            key, sep, value = line.rstrip("\n").partition(": ")
+            if not sep:
+                continue
+            try:
+                metadata[key] = float(value)
+            except ValueError:
+                metadata[key] = value
+    return metadata
+
+def file_key(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+def summarize_agent(log, metadata):
+    times = log["TimeGlob"]
+    ticks = log["TimeLocal"]
+    queue = log["QueueLen"]
+    n = len(times)
+    elapsed = times[-1] - times[0] if n > 1 else 0.0
+    jump_sizes, jump_counts = np.unique(np.diff(ticks), return_counts=True)
+    return {
+        "metadata": metadata,
+        "events": n,
+        "start": float(times[0]) if n else None,
+        "end": float(times[-1]) if n else None,
+        "final_tick": float(ticks[-1]) if n else 0.0,
+        "tick_rate": (n - 1) / elapsed if elapsed > 0 else 0.0,
+        "jump_mean": float(log["JumpTime"][-1]) if n else 0.0,
+        "jump_sizes": jump_sizes.tolist(),
+        "jump_counts": jump_counts.tolist(),
+        "queue_max": float(queue.max()) if n else 0.0,
+        "queue_mean": float(queue.mean()) if n else 0.0,
+        # Least-squares slope of QueueLen over time, in messages per second
+        "queue_growth": float(np.polyfit(times, queue, 1)[0]) if elapsed > 0 else 0.0,
+    }
+
+def clocks_on_grid(log, grid):
+    """An agent's logical clock at every grid time (its last value at or before it, else 0)."""
+    idx = np.searchsorted(log["TimeGlob"], grid, side="right") - 1
+    return np.where(idx >= 0, log["TimeLocal"][np.maximum(idx, 0)], 0)
+
+def summarize_experiment(log_dirs, agents, step=1.0):
+    """
+        Cross-agent drift: the clock spread over time and the pairwise mean
+        absolute drift. Logs are loaded one at a time and only their clocks
+        on the grid are kept, so memory doesn't grow with log size.
+    """
+    starts = [stats["start"] for stats in agents if stats["start"] is not None]
+    ends = [stats["end"] for stats in agents if stats["end"] is not None]
+    if not starts:
+        return {"step": step, "times": [], "spread": [], "pairwise_drift": []}
+    grid = np.arange(min(starts), max(ends) + step, step)
+    clocks = np.zeros((len(log_dirs), len(grid)))
+    for i, log_dir in enumerate(log_dirs):
+        clocks[i] = clocks_on_grid(load_log(log_dir), grid)
+
+    pairwise = np.zeros((len(log_dirs), len(log_dirs)))
+    for i in range(len(log_dirs)):
+        pairwise[i] = np.abs(clocks - clocks[i]).mean(axis=1)
+
+    return {
+        "step": step,
+        "times": (grid - grid[0]).tolist(),
+        "spread": (clocks.max(axis=0) - clocks.min(axis=0)).tolist(),
+        "pairwise_drift": pairwise.tolist(),
+    }
+
+def load_summary(base_dir, step=1.0):
+    """
+        Returns {"agents": {name: stats}, "experiment": cross-agent stats} for
+        logs/<experiment>/, recomputing only what changed since the cache was
+        written.
+    """
+    cache_path = os.path.join(base_dir, CACHE_NAME)
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+        if cache.get("version") != CACHE_VERSION or cache.get("step") != step:
+            cache = {}
+
+    cached_agents = cache.get("agents", {})
+    agents = {}
+    keys = {}
+    changed = False
+    log_dirs = find_logs(base_dir)
+    for log_dir in log_dirs:
+        name = os.path.basename(os.path.normpath(log_dir))
+        key = file_key(event_log_path(log_dir))
+        keys[name] = key
+        if name in cached_agents and cached_agents[name]["key"] == key:
+            agents[name] = cached_agents[name]
+        else:
+            agents[name] = summarize_agent(load_log(log_dir), read_metadata(log_dir))
+            agents[name]["key"] = key
+            changed = True
+
+    experiment = cache.get("experiment")
+    if experiment is None or cache.get("keys") != keys:
+        experiment = summarize_experiment(log_dirs, list(agents.values()), step)
+        changed = True
+
+    if changed:
+        with open(cache_path, 'w') as f:
+            json.dump({"version": CACHE_VERSION, "step": step, "keys": keys,
+                       "agents": agents, "experiment": experiment}, f)
+
+    return {"agents": agents, "experiment": experiment}
+
+def plot_summary(summary, out_path, title):
+    """Static overview from the cached stats: clock spread over time and per-agent max queue length."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, (ax_drift, ax_queue) = plt.subplots(1, 2, figsize=(12, 4.5))
+    experiment = summary["experiment"]
+    ax_drift.plot(experiment["times"], experiment["spread"])
+    ax_drift.set_xlabel("TimeGlob")
+    ax_drift.set_ylabel("Max - min TimeLocal")
+
+    names = list(summary["agents"])
+    ax_queue.bar(range(len(names)), [summary["agents"][name]["queue_max"] for name in names])
+    ax_queue.set_xlabel("Agent")
+    ax_queue.set_ylabel("Max QueueLen")
+
+    fig.suptitle(title, fontsize=16, fontweight='bold')
+    fig.savefig(out_path)
+    plt.close(fig)
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize an experiment's logs (cached).")
+    parser.add_argument("-e", "--experiment", type=str, help="Experiment name.")
+    # -p or --plot : also write logs/<experiment>/summary.png
+    parser.add_argument("-p", "--plot", action="store_true", help="Plot drift and queue summaries.")
+    args = parser.parse_args()
+
+    if args.experiment is None:
+        print("[ERROR] No experiment name provided.")
+        exit(1)
+
+    base_dir = f"logs/{args.experiment}/"
+    summary = load_summary(base_dir)
+    print("Agent,ClockSpeed,Events,TickRate,FinalTick,JumpMean,QueueMax,QueueMean")
+    for name, stats in summary["agents"].items():
+        speed = stats["metadata"].get("Clock Speed", "")
+        print(f"{name},{speed},{stats['events']},{stats['tick_rate']:.3f},{stats['final_tick']:.0f},"
+              f"{stats['jump_mean']:.3f},{stats['queue_max']:.0f},{stats['queue_mean']:.2f}")
+    spread = summary["experiment"]["spread"]
+    if spread:
+        print(f"[INFO] Clock spread: mean {np.mean(spread):.2f}, max {np.max(spread):.0f}, final {spread[-1]:.0f}")
+    if args.plot:
+        plot_summary(summary, f"{base_dir}summary.png", args.experiment)
+
+if __name__ == '__main__':
+    main()
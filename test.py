@@ -3,12 +3,36 @@ import os
 import shutil
 import socket
 import json
+import struct
+import glob
 import time
 import threading
+import asyncio
+import sys
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+from PIL import Image, ImageSequence
 
 # Import the ClientProcess class and Events enum.
 # Make sure your ClientProcess class is saved in client_process.py
-from client import ClientProcess, Events
+from client import ClientProcess, Events, encode_frame, encode_messages, decode_frames
+from async_runner import AsyncPeerPool, start_ticking
+from host import ShardRouter, supervise_shards
+from simulate import Simulator
+from runner import run_event
+from batch_sim import simulate_batch
+from eventlog import read_binary_log, binary_to_csv, ThreadedEventLog
+from analysis import window_bounds
+from make_animations import render_parallel, agent_colors
+from summaries import load_summary
+from compare import compare
+from clocks import VectorClock, HybridClock, parse_vector, happened_before
+from bench import bench_logging, compare_results, metric
+from metrics import Histogram, MetricsServer, fetch
+from topology import build_graph, neighbors, broadcast_fanout
+from shm_transport import segment_name
+from launcher import clock_speeds, reserve_ports, make_experiment, expand_specs, launch, run_matrix
 
 class TestClientProcess(unittest.TestCase):
     def setUp(self):
@@ -52,6 +76,56 @@ class TestClientProcess(unittest.TestCase):
         self.assertTrue(self.client.is_available, "Client should be available after time has passed")
         self.assertEqual(self.client.ticks, current_ticks + 1, "Ticks should have incremented by 1")
 
+    def test_absolute_scheduler_deadlines(self):
+        """Test that the absolute scheduler ticks on start + k/clock_speed and counts overruns."""
+        client = ClientProcess(10, 50040, "absolute_client", self.experiment_dir, listen=False, scheduler="absolute")
+        client.start(100.0)
+        client.time = 100.0
+        client.set_unavailable()
+
+        # A late tick doesn't push back the following deadlines
+        client.time = 100.25
+        client.update_availability()
+        self.assertTrue(client.is_available)
+        client.set_unavailable()
+        self.assertAlmostEqual(client.next_deadline, 100.2)
+        self.assertEqual(client.overruns, 1, "A tick more than a period late is an overrun")
+
+        client.time = 100.21
+        client.update_availability()
+        self.assertTrue(client.is_available, "The next deadline has already passed")
+        client.set_unavailable()
+        self.assertAlmostEqual(client.lateness_max, 0.15)
+        self.assertEqual(client.ticks, 2)
+        client.close()
+
+    def test_relative_scheduler_lateness(self):
+        """Test that relative ticks are late against the previous tick, while their drift accumulates."""
+        client = ClientProcess(10, 50041, "relative_client", self.experiment_dir, listen=False)
+        client.start(100.0)
+        for t in (100.0, 100.12, 100.24):
+            client.time = t
+            client.set_unavailable()
+        self.assertAlmostEqual(client.lateness_max, 0.02)
+        self.assertAlmostEqual(client.lateness_sum, 0.04)
+        self.assertAlmostEqual(client.drift, 0.04)
+        self.assertEqual(client.overruns, 0)
+        client.close()
+
+    def test_async_shared_start_time(self):
+        """Test that asyncio ticks start at the shared start time rather than when the agent gets there."""
+        client = ClientProcess(10, 50042, "async_start", self.experiment_dir, listen=False)
+        config = {"port": 50042, "other_ports": [], "clock_speed": 10, "name": "async_start", "randn_UB": 1, "quiet": True}
+        start_time = time.time() + 0.3
+
+        async def run():
+            await start_ticking(asyncio.get_running_loop(), client, config, 0.15, start_time)
+        asyncio.run(run())
+        self.assertEqual(client.start_time, start_time)
+        self.assertGreaterEqual(time.time(), start_time + 0.15)
+        self.assertLess(client.lateness_max, 0.1, "The first tick should run at the shared start")
+        client.close()
+
     def test_set_unavailable(self):
         """Test that set_unavailable marks the client as unavailable and sets last_available."""
         self.client.is_available = True
@@ -92,6 +166,572 @@ class TestClientProcess(unittest.TestCase):
         self.assertEqual(result['msg'], message, "The received message does not match the sent message")
         receiver.close()
 
+    def test_pooled_connection_reuse(self):
+        """Test that pooled sends reuse a single framed connection per peer."""
+        sender = ClientProcess(self.clock_speed, 50002, "pooled_sender", self.experiment_dir, pooled=True)
+        receiver = ClientProcess(self.clock_speed, 50003, "pooled_receiver", self.experiment_dir, pooled=True)
+
+        received = []
+        def server_thread():
+            for _ in range(3):
+                received.append(receiver.await_message())
+
+        t = threading.Thread(target=server_thread)
+        t.start()
+        messages = [{"tick": i, "port": 50002} for i in range(3)]
+        for message in messages:
+            sender.send_message(message, [50003])
+        t.join(timeout=2)
+        self.assertEqual(received, messages, "Pooled messages were not received in order")
+        self.assertEqual(sender.connects, 1, "Pool should connect once per peer")
+        self.assertEqual(sender.reuses, 2, "Later sends should reuse the pooled connection")
+        sender.close()
+        receiver.close()
+
+    def test_binary_wire_coalescing(self):
+        """Test that binary frames round-trip, fall back to JSON, and that coalesced sends share one write."""
+        messages = [{"tick": 1, "port": 50007}, {"tick": 2, "port": 50007, "sent": 1.5},
+                    {"tick": 3, "port": 50007, "content": "json"}, {"tick": 4, "port": 50007}]
+        data = bytearray(encode_messages(messages, "binary"))
+        self.assertLess(len(data), len(encode_messages(messages)), "Binary frames should be smaller than JSON")
+        decoded = []
+        decode_frames(data, decoded)
+        self.assertEqual(decoded, messages, "Binary frames did not round-trip")
+
+        sender = ClientProcess(self.clock_speed, 50007, "wire_sender", self.experiment_dir, pooled=True,
+                               wire="binary", coalesce=True)
+        receiver = ClientProcess(self.clock_speed, 50008, "wire_receiver", self.experiment_dir, pooled=True)
+        for message in messages:
+            sender.send_message(message, [50008])
+        sender.flush_outbox()
+        received = []
+        while len(received) < len(messages):
+            received.extend(receiver.await_messages())
+        self.assertEqual(received, messages, "Coalesced messages were not received in order")
+        self.assertEqual(sender.pool_stats()["coalesced"], 3, "All four messages should share one write")
+        self.assertEqual(sender.connects + sender.reuses, 1)
+        sender.close()
+        receiver.close()
+
+    def test_framed_receive_reassembly(self):
+        """Test that large and split frames are reassembled and delivered in batches."""
+        receiver = ClientProcess(self.clock_speed, 50004, "framed_receiver", self.experiment_dir, pooled=True)
+        big = {"tick": 7, "port": 1, "content": "x" * 5000}
+        small = {"tick": 8, "port": 1}
+        data = encode_frame(big) + encode_frame(small)
+
+        received = []
+        def server_thread():
+            while len(received) < 2:
+                batch = receiver.await_messages()
+                if batch is None:
+                    break
+                received.extend(batch)
+
+        t = threading.Thread(target=server_thread)
+        t.start()
+        with socket.create_connection(("127.0.0.1", 50004)) as s:
+            # Split the stream in the middle of the first frame's header and payload
+            for chunk in (data[:2], data[2:1000], data[1000:]):
+                s.sendall(chunk)
+                time.sleep(0.05)
+            t.join(timeout=2)
+        self.assertEqual(received, [big, small], "Framed messages were not reassembled correctly")
+        receiver.close()
+
+    def test_undecodable_frame_drops_only_its_connection(self):
+        """Test that a bad frame closes its own connection while other peers keep delivering."""
+        receiver = ClientProcess(self.clock_speed, 50005, "framed_receiver", self.experiment_dir, pooled=True)
+        with socket.create_connection(("127.0.0.1", 50005)) as bad, \
+                socket.create_connection(("127.0.0.1", 50005)) as good:
+            # A good frame, then a binary frame whose flags match no record layout
+            bad.sendall(encode_frame({"tick": 1, "port": 1}) + struct.pack("!I", 3) + bytes([0xB7, 0, 0]))
+            received = []
+            while len(received) < 1:
+                received.extend(receiver.await_messages())
+            self.assertEqual(received, [{"tick": 1, "port": 1}])
+            self.assertEqual(bad.recv(1), b"", "The bad connection should be closed")
+
+            good.sendall(encode_frame({"tick": 2, "port": 2}))
+            self.assertEqual(receiver.await_messages(), [{"tick": 2, "port": 2}])
+            self.assertFalse(receiver.closed)
+        receiver.close()
+        self.assertIsNone(receiver.await_messages())
+
+    def test_async_pool_interoperates_with_pooled_receiver(self):
+        """Test that the asyncio engine's stream pool speaks the pooled framing protocol."""
+        receiver = ClientProcess(self.clock_speed, 50005, "async_receiver", self.experiment_dir, pooled=True)
+        messages = [{"tick": i, "port": 50006} for i in range(3)]
+
+        async def send_all():
+            pool = AsyncPeerPool(receiver.host)
+            for message in messages:
+                pool.send(50005, message)
+            await asyncio.sleep(0.2)
+            await pool.close()
+            return pool
+
+        pool = asyncio.run(send_all())
+        received = []
+        while len(received) < len(messages):
+            received.extend(receiver.await_messages())
+        self.assertEqual(received, messages, "Async pool frames were not received in order")
+        self.assertEqual(pool.connects, 1, "Frames sent while connecting should share one connection")
+        receiver.close()
+
+    def test_shard_router_delivers_in_memory(self):
+        """Test that hosted agents in one shard exchange messages without sockets."""
+        agents = {port: ClientProcess(self.clock_speed, port, f"hosted_{port}", self.experiment_dir, listen=False)
+                  for port in (50010, 50011, 50012)}
+        router = ShardRouter(agents, {port: 0 for port in agents}, [], "127.0.0.1")
+        for communicator in agents.values():
+            communicator.sender = router.send
+
+        message = {"tick": 3, "port": 50010}
+        agents[50010].send_message(message, [50011, 50012])
+        self.assertEqual(list(agents[50011].network_queue), [message])
+        self.assertEqual(list(agents[50012].network_queue), [message])
+        self.assertEqual(router.local_sends, 2)
+        for communicator in agents.values():
+            communicator.close()
+
+    def test_failed_shard_stops_the_others(self):
+        """Test that a shard dying before the start barrier stops the shards waiting on it."""
+        ctx = multiprocessing.get_context("fork")
+        barrier = ctx.Barrier(2)
+        waiting = ctx.Process(target=barrier.wait, name="shard 0")
+        failing = ctx.Process(target=sys.exit, args=(1,), name="shard 1")
+        waiting.start()
+        failing.start()
+        start = time.time()
+        self.assertFalse(supervise_shards([waiting, failing], barrier, time.time() + 30))
+        self.assertLess(time.time() - start, 10)
+        self.assertFalse(waiting.is_alive())
+
+    def test_simulation_is_reproducible(self):
+        """Test that the discrete-event simulator gives identical logs for the same seed."""
+        ports = [50020, 50021, 50022]
+        configs = make_experiment({"name": self.experiment_dir, "agents": 3, "clock_speeds": [1, 2, 3], "randn_UB": 6}, ports)
+
+        logs = []
+        for run in ("sim_a", "sim_b"):
+            Simulator(configs, seed=7, delay=0.01, jitter=0.01, experiment_dir=run).run(10)
+            with open(f"logs/{run}/c1_log/events.csv") as f:
+                logs.append(f.read())
+        self.assertEqual(logs[0], logs[1], "Simulations with the same seed should match")
+        # 10 simulated seconds at 1 tick/sec: ticks at t = 0..10 plus the header
+        self.assertEqual(len(logs[0].splitlines()), 12)
+
+    def test_batch_simulation_invariants(self):
+        """Test that batched replicas tick on schedule and never run a clock backwards."""
+        state, stats = simulate_batch([1, 2, 3], randn_UB=6, duration=10, replicas=20, seed=3)
+        # Each agent takes floor(10 * speed) + 1 events, and every tick advances its clock at least once
+        np.testing.assert_array_equal(state.events, np.tile([11, 21, 31], (20, 1)))
+        self.assertTrue((state.clocks >= state.events - 1).all(), "Logical clocks fell behind the tick count")
+        self.assertTrue((state.qlen >= 0).all())
+
+    def test_binary_log_round_trip(self):
+        """Test that binary logs read back as columns and convert to the CSV format."""
+        client = ClientProcess(self.clock_speed, 50030, "binary_client", self.experiment_dir,
+                               listen=False, log_format="binary")
+        client.sender = lambda port, message: None
+        client.time = 1.5
+        client.internal_event()
+        client.ticks = 4
+        client.send_message({"tick": 4, "port": 50030}, [50031])
+        client.send_message({"tick": 4, "port": 50030}, [50031, 50032])
+        client.append_message({"tick": 9, "port": 50031})
+        client.read_message()
+        client.close()
+
+        columns = read_binary_log(client.log_path)
+        self.assertEqual(columns["Event"].tolist(), [3, 2, 4, 1])
+        self.assertEqual(columns["TimeLocal"].tolist(), [0, 4, 4, 9])
+        self.assertEqual(columns["FromPort"].tolist(), [-1, 50030, 50030, 50031])
+
+        csv_path = client.log_path[:-4] + ".csv"
+        binary_to_csv(client.log_path, csv_path)
+        with open(csv_path) as f:
+            rows = f.read().splitlines()
+        self.assertEqual(rows[0], "Event,TimeGlob,TimeLocal,QueueLen,FromPort,ToPort")
+        self.assertEqual(rows[1], "Events.INTERNAL_EVENT,1.5,0,0,NULL,NULL")
+        self.assertEqual(rows[3], "Events.BROADCAST_MSG,1.5,4,0,50030,ALL")
+
+    def test_threaded_log_drop_policy_and_drain(self):
+        """Test that the background log writer drops on a full buffer and drains on close."""
+        class SlowSink:
+            path = "unused"
+            def __init__(self):
+                self.release = threading.Event()
+                self.rows = []
+                self.closed = False
+            def record(self, *event):
+                self.release.wait()
+                self.rows.append(event)
+            def flush(self):
+                pass
+            def close(self):
+                self.closed = True
+
+        sink = SlowSink()
+        log = ThreadedEventLog(sink, capacity=2, policy="drop")
+        log.record(0)
+        # Let the writer pick up the first event and stall in the sink
+        time.sleep(0.1)
+        for i in range(1, 6):
+            log.record(i)
+        sink.release.set()
+        log.close()
+        self.assertEqual(sink.rows, [(0,), (1,), (2,)], "Buffered events should be written in order")
+        self.assertEqual(log.dropped, 3, "Events beyond the buffer capacity should be dropped")
+        self.assertTrue(sink.closed)
+
+        with self.assertRaises(ValueError):
+            log.record(6)
+
+    def test_window_bounds_match_masks(self):
+        """Test that searchsorted windows select the same rows as the original boolean masks."""
+        times = np.sort(np.random.default_rng(0).uniform(0, 60, size=500))
+        frames = range(0, 60)
+        lo, hi = window_bounds(times, frames, 20)
+        for f, frame in enumerate(frames):
+            if frame < 20:
+                mask = times <= frame
+            else:
+                mask = (times > frame - 20) & (times <= frame)
+            np.testing.assert_array_equal(times[lo[f]:hi[f]], times[mask])
+
+    def test_summary_cache_reuse(self):
+        """Test that experiment summaries are cached and recomputed only for changed logs."""
+        ports = [50050, 50051]
+        configs = make_experiment({"name": "summary_test", "agents": 2, "clock_speeds": [1, 4], "randn_UB": 4}, ports)
+        Simulator(configs, seed=1).run(20)
+
+        summary = load_summary("logs/summary_test/")
+        self.assertEqual(summary["agents"]["c1_log"]["events"], 21)
+        self.assertEqual(summary["agents"]["c2_log"]["metadata"]["Clock Speed"], 4)
+        self.assertTrue(os.path.exists("logs/summary_test/summary.json"))
+
+        # An unchanged log is served from the cache; an appended one is recomputed
+        with open("logs/summary_test/c1_log/events.csv", "a") as f:
+            f.write("Events.INTERNAL_EVENT,25.0,500,0,NULL,NULL\n")
+        summary = load_summary("logs/summary_test/")
+        self.assertEqual(summary["agents"]["c1_log"]["events"], 22)
+        self.assertEqual(summary["agents"]["c1_log"]["final_tick"], 500)
+        self.assertEqual(max(summary["experiment"]["spread"]), 500 - summary["agents"]["c2_log"]["final_tick"])
+
+    def test_compare_experiments(self):
+        """Test that compare reduces each experiment to one row with its speed ratio and randn_UB."""
+        base_dirs = []
+        for exp, speeds, ub in [("compare_a", [1, 2], 3), ("compare_b", [1, 6], 8)]:
+            ports = [50052, 50053]
+            configs = make_experiment({"name": exp, "agents": 2, "clock_speeds": speeds, "randn_UB": ub}, ports)
+            Simulator(configs, seed=2).run(10)
+            base_dirs.append(f"logs/{exp}/")
+
+        rows = compare(base_dirs, jobs=2)
+        self.assertEqual([row["experiment"] for row in rows], ["compare_a", "compare_b"])
+        self.assertEqual([row["speed_ratio"] for row in rows], [2.0, 6.0])
+        self.assertEqual([row["randn_UB"] for row in rows], [3, 8])
+        self.assertTrue(all(row["agents"] == 2 and row["drift_mean"] is not None for row in rows))
+
+    def test_vector_clock_deltas(self):
+        """Test that delta-encoded vector clocks match full vector merges, and that clocks are logged."""
+        import random
+        rng = random.Random(3)
+        ports = [50060, 50061, 50062, 50063, 50064, 50065]
+        clocks = {port: VectorClock(port, ports) for port in ports}
+        full = {port: [0] * len(ports) for port in ports}
+        for _ in range(500):
+            sender = rng.choice(ports)
+            others = [p for p in ports if p != sender]
+            recipients = others if rng.random() < 0.2 else [rng.choice(others)]
+            clocks[sender].local()
+            full[sender][ports.index(sender)] += 1
+            for port in recipients:
+                clocks[port].receive(clocks[sender].stamp(port))
+                full[port] = [max(a, b) for a, b in zip(full[port], full[sender])]
+                full[port][ports.index(port)] += 1
+        self.assertEqual({port: clock.values.tolist() for port, clock in clocks.items()}, full)
+
+        configs = make_experiment({"name": "clock_test", "agents": 3, "clock_speeds": [1, 2, 3], "randn_UB": 3,
+                                   "options": {"clock": "vector"}}, ports[:3])
+        Simulator(configs, seed=4).run(10)
+        with open("logs/clock_test/c1_log/events.csv") as f:
+            header = f.readline().strip().split(",")
+            vectors = [parse_vector(line.strip().split(",")[-1]) for line in f]
+        self.assertEqual(header[-1], "Clock")
+        self.assertTrue(all(happened_before(a, b) for a, b in zip(vectors, vectors[1:])))
+
+        # Deltas need in-order delivery: no jittered simulation and no one-shot connections
+        with self.assertRaises(ValueError):
+            Simulator(configs, seed=4, jitter=0.1)
+        with self.assertRaises(ValueError):
+            ClientProcess(self.clock_speed, 50066, "one_shot_vector", self.experiment_dir, clock="vector", peers=[50067])
+
+        # After a failed send the next stamp for that peer carries every entry again
+        sender = ClientProcess(self.clock_speed, 50066, "vector_sender", self.experiment_dir, pooled=True,
+                               clock="vector", peers=[50067, 50068])
+        sender.clock.receive([2, 5])
+        sender.send_message({"tick": 1, "port": 50066}, 50067)
+        sender.clock.local()
+        receiver = VectorClock(50067, [50066, 50068])
+        receiver.receive(sender.clock.stamp(50067))
+        self.assertEqual(receiver.values[2], 5, "The entry sent with the failed message was lost")
+        sender.close()
+
+        hlc = HybridClock()
+        hlc.local(10.0)
+        hlc.receive([int(20e6), 4], 10.0)
+        self.assertEqual(hlc.format(), f"{int(20e6)}:5")
+
+    def test_queue_policies(self):
+        """Test bounded (drop and block), coalescing and multi-read queue policies."""
+        bounded = ClientProcess(self.clock_speed, 50070, "bounded", self.experiment_dir, listen=False,
+                                queue_policy="bounded", queue_limit=2)
+        bounded.append_messages([{"tick": t, "port": 1} for t in (1, 2, 3)])
+        self.assertEqual([m["tick"] for m in bounded.network_queue], [2, 3], "The oldest message should be dropped")
+
+        # A blocking append waits until the tick loop makes room
+        t = threading.Thread(target=bounded.append_messages, args=([{"tick": 4, "port": 1}], True))
+        t.start()
+        time.sleep(0.1)
+        self.assertTrue(t.is_alive(), "A full bounded queue should block the listener")
+        bounded.read_message()
+        t.join(timeout=2)
+        self.assertEqual([m["tick"] for m in bounded.network_queue], [3, 4])
+        self.assertEqual(bounded.queue_stats()["dropped"], 1)
+        bounded.close()
+
+        coalescing = ClientProcess(self.clock_speed, 50071, "coalescing", self.experiment_dir, listen=False,
+                                   queue_policy="coalesce", reads_per_tick=2)
+        coalescing.append_messages([{"tick": 5, "port": 1}, {"tick": 2, "port": 2}, {"tick": 9, "port": 1},
+                                    {"tick": 7, "port": 1}])
+        self.assertEqual(list(coalescing.network_queue), [{"tick": 9, "port": 1}, {"tick": 2, "port": 2}])
+        self.assertEqual(coalescing.queue_stats()["coalesced"], 2)
+        run_event(coalescing, [50070], 3)
+        self.assertEqual(len(coalescing.network_queue), 0, "Both queued messages should be read in one tick")
+        self.assertEqual(coalescing.ticks, 9)
+        coalescing.close()
+
+        # Policies that drop or merge messages would lose vector clock deltas
+        for policy in ("bounded", "coalesce"):
+            with self.assertRaises(ValueError):
+                ClientProcess(self.clock_speed, 50072, "vector", self.experiment_dir, listen=False,
+                              queue_policy=policy, clock="vector", peers=[50070])
+
+    def test_bench_baseline_comparison(self):
+        """Test that benchmark metrics are flagged only when they worsen past the tolerance."""
+        results = bench_logging("binary", "inline", 1000)
+        self.assertGreater(results["logging.binary.inline.us_per_event"]["value"], 0)
+
+        baseline = {"a": metric(100, "msg/s"), "b": metric(10, "us", False), "c": metric(100, "msg/s")}
+        current = {"a": metric(70, "msg/s"), "b": metric(11, "us", False), "d": metric(1, "us", False)}
+        rows = {name: regressed for name, _, _, _, regressed in compare_results(current, baseline, 0.2)}
+        self.assertEqual(rows, {"a": True, "b": False}, "Only a 30% throughput drop should count as a regression")
+
+    def test_metrics_endpoint(self):
+        """Test that instrumented agents count ticks and messages and serve them over HTTP."""
+        histogram = Histogram()
+        for value in (0, 1, 3, 100, 1000):
+            histogram.record(value)
+        self.assertEqual(histogram.counts[:3], [1, 1, 1])
+        self.assertEqual(histogram.percentile(50), 3)
+        self.assertEqual(histogram.percentile(100), 1000)
+
+        agent = ClientProcess(self.clock_speed, 50080, "metered", self.experiment_dir, listen=False, metrics=True)
+        agent.sender = lambda port, message: None
+        agent.time = time.time()
+        agent.start(agent.time)
+        agent.send_message({"tick": 0, "port": 50080}, [50081, 50082])
+        agent.set_unavailable()
+        agent.append_message({"tick": 5, "port": 50081})
+        agent.read_message()
+        agent.set_unavailable()
+
+        server = MetricsServer(50083, lambda: [agent.metrics_snapshot(), agent.metrics_snapshot()])
+        try:
+            data = fetch(50083)
+        finally:
+            server.close()
+        counters = data["agents"][0]["counters"]
+        self.assertEqual((counters["ticks"], counters["messages_out"], counters["messages_in"]), (2, 2, 1))
+        self.assertEqual(set(data["agents"][0]["send_latency_us_by_peer"]), {"50081", "50082"})
+        self.assertEqual(data["total"]["counters"]["ticks"], 4, "The aggregate should sum both snapshots")
+        self.assertEqual(data["total"]["histograms"]["queue_depth"]["count"], 4)
+        agent.close()
+
+        # Snapshots taken while the tick thread meets new peers
+        metrics = agent.metrics
+        adder = threading.Thread(target=lambda: [metrics.sent(port, 1e-6) for port in range(3000)])
+        adder.start()
+        while adder.is_alive():
+            metrics.snapshot()
+        adder.join()
+        self.assertEqual(len(metrics.snapshot()["send_latency_us_by_peer"]), 3002)
+
+    def test_launcher_runs_experiment(self):
+        """Test spec expansion, port reservation and a short supervised run with a shared start."""
+        self.assertEqual(clock_speeds("2,3", 4), [2, 3, 3, 3])
+        self.assertEqual(clock_speeds("uniform:1:3", 5, seed=1), clock_speeds("uniform:1:3", 5, seed=1))
+        specs = expand_specs({"defaults": {"name": "m", "agents": 3},
+                              "matrix": {"clock_speeds": ["1,2", "3"], "randn_UB": [4, 10]}})
+        self.assertEqual(len(specs), 4)
+        self.assertEqual(len({spec['name'] for spec in specs}), 4)
+
+        # Launcher ports stay below the ephemeral range; a port held elsewhere is skipped
+        sockets = reserve_ports(2, 31090)
+        ports = [s.getsockname()[1] for s in sockets]
+        self.assertTrue(31090 <= ports[0] < ports[1] < 32768)
+        more = reserve_ports(1, 31090)
+        self.assertTrue(ports[1] < more[0].getsockname()[1] < 32768)
+        for sock in sockets + more:
+            sock.close()
+
+        configs = make_experiment({"name": "launched", "agents": 3, "clock_speeds": [1, 2]}, [1, 2, 3])
+        self.assertEqual([c['clock_speed'] for c in configs], [1, 2, 2])
+        self.assertEqual(configs[1]['other_ports'], [1, 3])
+        self.assertEqual(configs[0]['randn_UB'], 6)
+
+        ok = launch({"name": "launched", "agents": 3, "clock_speeds": "5"}, 1, base_port=31090)
+        self.assertTrue(ok)
+        for i in (1, 2, 3):
+            with open(f"logs/launched/c{i}_log/md.txt") as f:
+                self.assertIn("Effective Clock Speed", f.read())
+
+        # Experiments that run one at a time reuse the lowest port range
+        specs = [{"name": f"matrix_{i}", "agents": 2} for i in range(2)]
+        self.assertEqual(run_matrix(specs, 1, 2, "host", shards=2, base_port=31090), [])
+        first_ports = []
+        for spec in specs:
+            with open(f"logs/{spec['name']}/c1_log/md.txt") as f:
+                first_ports += [line for line in f if line.startswith("Port:")]
+        self.assertEqual(len(first_ports), 2)
+        self.assertEqual(first_ports[0], first_ports[1])
+        # Sixteen concurrent ranges of up to 1000 ports would run into the ephemeral range
+        specs = [{"name": "big", "agents": 1000}] + [{"name": f"small_{i}", "agents": 1} for i in range(15)]
+        with self.assertRaises(ValueError):
+            run_matrix(specs, 1, 16, "threaded")
+
+    def test_topologies(self):
+        """Test that graphs are symmetric, seeded and of the right degree, and that broadcasts respect the fan-out."""
+        ports = tuple(range(60000, 60020))
+        for kind in ("ring", "regular", "small_world"):
+            graph = build_graph(kind, ports, 4, 0.3, 1)
+            for port, adjacent in graph.items():
+                self.assertNotIn(port, adjacent)
+                for other in adjacent:
+                    self.assertIn(port, graph[other])
+            if kind != "small_world":
+                self.assertTrue(all(len(adjacent) == 4 for adjacent in graph.values()))
+            # Rewiring keeps the edge count
+            self.assertEqual(sum(map(len, graph.values())), 4 * len(ports))
+        self.assertEqual(build_graph("ring", ports, 2)[60000], [60001, 60019])
+        self.assertNotEqual(build_graph("regular", ports, 4, seed=1), build_graph("regular", ports, 4, seed=2))
+
+        # A random regular graph is far more compact than the ring with the same degree
+        def diameter(graph):
+            longest = 0
+            for source in graph:
+                seen = {source}
+                frontier = [source]
+                depth = 0
+                while frontier:
+                    frontier = [n for port in frontier for n in graph[port] if n not in seen]
+                    seen.update(frontier)
+                    depth += bool(frontier)
+                self.assertEqual(len(seen), len(graph), "The graph should be connected")
+                longest = max(longest, depth)
+            return longest
+        many = tuple(range(10000, 10200))
+        regular = build_graph("regular", many, 4)
+        self.assertTrue(all(len(adjacent) == 4 for adjacent in regular.values()))
+        self.assertEqual(diameter(build_graph("ring", many, 4)), 50)
+        self.assertLess(diameter(regular), 12)
+
+        # Every agent derives the same graph from its own config
+        config = {"port": 60005, "other_ports": [p for p in ports if p != 60005], "topology": "small_world", "degree": 4}
+        self.assertEqual(neighbors(config), build_graph("small_world", ports, 4, 0.1, 0)[60005])
+        self.assertIsNone(broadcast_fanout({"topology": "ring"}))
+        self.assertEqual(broadcast_fanout({"topology": "gossip", "degree": 3}), 3)
+
+        # A broadcast (randn == n + 1) reaches fanout random neighbors
+        class Recorder:
+            ticks = 0
+            port = 60000
+            network_queue = []
+            def send_message(self, message, ports):
+                self.sent = ports
+        class Broadcast:
+            def randint(self, lo, hi):
+                return 20
+            def sample(self, population, k):
+                return population[:k]
+        recorder = Recorder()
+        run_event(recorder, list(ports[1:]), 40, Broadcast(), fanout=3)
+        self.assertEqual(recorder.sent, [60001, 60002, 60003])
+        run_event(recorder, list(ports[1:]), 40, Broadcast())
+        self.assertEqual(len(recorder.sent), 19)
+
+    def test_shared_memory_transport(self):
+        """Test shared-memory delivery, the TCP fallback for full lanes and unknown peers, and cleanup."""
+        receiver = ClientProcess(1, 50100, "shm_receiver", self.experiment_dir, transport="shm", shm_slots=2,
+                                 peers=[50101])
+        sender = ClientProcess(1, 50101, "shm_sender", self.experiment_dir, transport="shm", peers=[50100])
+        try:
+            sender.send_message({"tick": 1, "port": 50101}, 50100)
+            sender.send_message({"tick": 2, "port": 50101}, [50100])
+            # The lane holds two slots, so the third message goes over TCP
+            sender.send_message({"tick": 3, "port": 50101}, 50100)
+            self.assertEqual(sender.shm.sent, 2)
+            self.assertEqual(sender.shm.fallbacks, 1)
+            self.assertEqual(receiver.await_message(), {"tick": 3, "port": 50101})
+
+            receiver.drain_shared()
+            self.assertEqual(list(receiver.network_queue), [{"tick": 1, "port": 50101}, {"tick": 2, "port": 50101}])
+            # Drained slots are free again
+            sender.send_message({"tick": 4, "port": 50101}, 50100)
+            self.assertEqual(receiver.shm.drain(), [{"tick": 4, "port": 50101}])
+
+            # A slot published before its words are visible is left for a later drain
+            lane = sender.shm.lanes[50100]
+            tail = int(lane.tails[0])
+            lane.tails[0] = tail + 1
+            self.assertEqual(receiver.shm.drain(), [])
+            lane.tails[0] = tail
+            self.assertTrue(lane.put(6, 50101))
+            self.assertEqual(receiver.shm.drain(), [{"tick": 6, "port": 50101}])
+
+            # The client's own socket (50000) has no inbox, so this falls back to TCP
+            self.assertFalse(sender.shm.send(self.port, {"tick": 5, "port": 50101}))
+        finally:
+            receiver.close()
+            sender.close()
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(segment_name(50100))
+
+    def test_parallel_animation_frames(self):
+        """Test that frames rendered in chunks on a pool come out complete and stitch in order."""
+        metric = [("TimeGlob", "TimeLocal")]
+        for name, duration, frames in [("animation_test", 4, 4), ("short_animation", 0.5, 1)]:
+            Simulator(make_experiment({"name": name, "agents": 2, "clock_speeds": [1, 3]}, [50120, 50121]),
+                      seed=5).run(duration)
+            base_dir = f"logs/{name}/"
+            render_parallel(base_dir, metric, "test", agent_colors(2), 2, "png", chunk_size=1)
+            frame_paths = sorted(glob.glob(f"{base_dir}TimeGlob_vs_TimeLocal_frames/frame_*.png"))
+            self.assertEqual([os.path.basename(path) for path in frame_paths],
+                             [f"frame_{f:05d}.png" for f in range(frames)])
+            pngs = [np.asarray(Image.open(path).convert("RGB"), dtype=np.int32) for path in frame_paths]
+
+            render_parallel(base_dir, metric, "test", agent_colors(2), 2, "gif", chunk_size=1)
+            with Image.open(f"{base_dir}TimeGlob_vs_TimeLocal.gif") as gif:
+                gif_frames = [np.asarray(frame.convert("RGB"), dtype=np.int32) for frame in ImageSequence.Iterator(gif)]
+            self.assertEqual(len(gif_frames), frames)
+            # Each GIF frame is closest to the PNG frame with the same index
+            for i, frame in enumerate(gif_frames):
+                distances = [np.abs(frame - png).mean() for png in pngs]
+                self.assertEqual(int(np.argmin(distances)), i)
+
     def test_queue_operations(self):
         """
         Test that append_message and read_message work as expected.
@@ -0,0 +1,139 @@
+import random
+import argparse
+from functools import lru_cache
+
+"""
+    Who each agent talks to. By default every agent knows every other agent
+    and a broadcast reaches all of them, so a broadcast costs O(N) sends.
+    The topology config keys restrict an agent's unicasts and broadcasts to
+    its neighbors and can cap a broadcast at a fixed fan-out:
+        topology: full (default), ring, regular, small_world or gossip
+        degree: neighbors per agent for ring, regular and small_world (default 4)
+        fanout: peers a broadcast reaches, picked at random from the neighbors
+            (default: all neighbors; for gossip, degree)
+        rewire: small_world's chance of rewiring each edge (default 0.1)
+        topology_seed: seed for regular and small_world (default 0)
+
+    Graphs are built from the sorted ports of the experiment and the seed
+    only, so every agent, in any process, derives the same graph from its
+    own config. other_ports stays the membership list; vector clocks still
+    span every agent.
+"""
+
+TOPOLOGIES = ["full", "ring", "regular", "small_world", "gossip"]
+
+# Ring lattice over order: each agent linked to the degree // 2 nearest on either
+# side, plus the opposite agent when degree is odd
+def lattice(order, degree):
+    n = len(order)
+    edges = set()
+    for i in range(n):
+        for j in range(1, degree // 2 + 1):
+            edges.add((i, (i + j) % n))
+    if degree % 2:
+        if n % 2:
+            raise ValueError(f"An odd degree ({degree}) needs an even number of agents, not {n}")
+        for i in range(n // 2):
+            edges.add((i, i + n // 2))
+    return edges
+
+# Random simple degree-regular graph by stub pairing: every agent gets degree
+# stubs, and random pairs of stubs become edges unless that would add a
+# self-loop or a duplicate edge. Starts over on the rare dead end.
+def random_regular(n, degree, rng, attempts=100):
+    if n * degree % 2:
+        raise ValueError(f"An odd degree ({degree}) needs an even number of agents, not {n}")
+    for _ in range(attempts):
+        stubs = [i for i in range(n) for _ in range(degree)]
+        adjacent = {i: set() for i in range(n)}
+        while stubs:
+            for _ in range(100):
+                a, b = rng.randrange(len(stubs)), rng.randrange(len(stubs))
+                u, v = stubs[a], stubs[b]
+                if u != v and v not in adjacent[u]:
+                    break
+            else:
+                break
+            adjacent[u].add(v)
+            adjacent[v].add(u)
+            for k in sorted((a, b), reverse=True):
+                stubs[k] = stubs[-1]
+                stubs.pop()
+        if not stubs:
+            return adjacent
+    raise ValueError(f"Could not build a {degree}-regular graph on {n} agents")
+
+@lru_cache(maxsize=16)
+def build_graph(kind, ports, degree=4, rewire=0.1, seed=0):
+    """
+        Returns {port: sorted neighbor ports} for ports, a sorted tuple.
+        ring: lattice over the sorted ports
+        regular: a random degree-regular graph, whose diameter
+            grows like log N rather than N
+        small_world: Watts-Strogatz; the ring lattice with each edge's far
+            end moved to a random agent with probability rewire
+    """
+    n = len(ports)
+    if degree >= n - 1:
+        return {port: [p for p in ports if p != port] for port in ports}
+    rng = random.Random(f"{seed}:{kind}")
+    order = list(ports)
+    if kind == "regular":
+        adjacent = random_regular(n, degree, rng)
+    elif kind in ("ring", "small_world"):
+        adjacent = {i: set() for i in range(n)}
+        for i, j in lattice(order, degree):
+            adjacent[i].add(j)
+            adjacent[j].add(i)
+    else:
+        raise ValueError(f"Unknown topology: {kind}")
+
+    if kind == "small_world":
+        for i, j in sorted(lattice(order, degree)):
+            if rng.random() >= rewire:
+                continue
+            candidates = [k for k in range(n) if k != i and k not in adjacent[i]]
+            if not candidates:
+                continue
+            k = rng.choice(candidates)
+            adjacent[i].discard(j)
+            adjacent[j].discard(i)
+            adjacent[i].add(k)
+            adjacent[k].add(i)
+
+    return {order[i]: sorted(order[j] for j in adjacent[i]) for i in range(n)}
+
+def neighbors(config):
+    """The ports this agent's unicasts and broadcasts go to."""
+    kind = config.get('topology', 'full')
+    if kind in ("full", "gossip"):
+        return list(config['other_ports'])
+    ports = tuple(sorted(set(config['other_ports']) | {config['port']}))
+    graph = build_graph(kind, ports, config.get('degree', 4), config.get('rewire', 0.1), config.get('topology_seed', 0))
+    return graph[config['port']]
+
+def broadcast_fanout(config):
+    """How many neighbors a broadcast reaches, or None for all of them."""
+    if config.get('topology', 'full') == "gossip":
+        return config.get('fanout', config.get('degree', 4))
+    return config.get('fanout')
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the neighbors of each agent under a topology.")
+    # -n or --agents : number of agents, on ports 1..n
+    parser.add_argument("-n", "--agents", type=int, default=10, help="Number of agents.")
+    # -k or --degree : neighbors per agent
+    parser.add_argument("-k", "--degree", type=int, default=4, help="Neighbors per agent.")
+    parser.add_argument("-T", "--topology", type=str, default="small_world", choices=TOPOLOGIES, help="Topology.")
+    parser.add_argument("--rewire", type=float, default=0.1, help="Small-world rewiring probability.")
+    parser.add_argument("--seed", type=int, default=0, help="Topology seed.")
+    args = parser.parse_args()
+
+    ports = list(range(1, args.agents + 1))
+    for port in ports:
+        config = {"port": port, "other_ports": [p for p in ports if p != port], "topology": args.topology,
+                  "degree": args.degree, "rewire": args.rewire, "topology_seed": args.seed}
+        print(f"{port}: {' '.join(map(str, neighbors(config)))}")
+
+if __name__ == '__main__':
+    main()